@@ -34,15 +34,16 @@ app.index_string = '''
 '''
 
 
+# Layouts are built on the first visit to each page; the page callbacks are registered at import
 @app.callback(Output('page-content', 'children'),
               [Input('url', 'pathname')])
 def display_page(pathname):
     if pathname == '/':
-        return page1_layout
+        return page1_layout()
     elif pathname == '/page1':
-        return page2_layout
+        return page2_layout()
     elif pathname == '/page3':
-        return page4_layout
+        return page4_layout()
 
 # Callback to set the active state
 @app.callback(
@@ -0,0 +1,22 @@
+// Signature profiles drawn in the browser from the shared bar axes and the values of each panel
+// (utils/figpanel.py: bar_axes, bar_panels), so a page of plots only transfers the values it lacks.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    reprint: {
+        barFigure: function (store, id) {
+            const panel = store && store.panels[id.panel];
+            if (!panel) {
+                return window.dash_clientside.no_update;
+            }
+            const layout = JSON.parse(JSON.stringify(store.axes.layout));
+            layout.title.text = panel.title;
+            layout.yaxis.title = {text: panel.yaxis_title};
+            layout.yaxis.range = [0, panel.y_max];
+            return {
+                data: store.axes.data.map(function (trace, i) {
+                    return Object.assign({}, trace, {y: Object.assign({}, panel.y[i])});
+                }),
+                layout: layout
+            };
+        }
+    }
+});
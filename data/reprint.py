@@ -1,43 +1,144 @@
+"""
+RePrint batch tool.
+
+    python data/reprint.py
+        rebuilds the app's prepared data: the signature header index, the binary copies
+        of the bundled references and the precomputed RePrint store (entries that are
+        up to date are kept unless --force is given).
+
+    python data/reprint.py 'data/signatures/*' --epsilon 0 --output-dir data/cosmic_reprints
+        writes the RePrint of every matching signature matrix, one file per input and epsilon,
+        skipping outputs newer than their input unless --force is given.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import numpy as np
 import pandas as pd
 
-name = 'transcribed.normalized.txt'
-data = pd.read_csv(f'signatures/{name}', sep='\t')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.utils import reprint_sweep
+from utils.references import convert_references, build_header_index, read_reference
+from utils.reprint_store import build_store
+
+FORMATS = {'tsv': '.reprint', 'csv': '.reprint.csv', 'npz': '.reprint.npz'}
+
+
+def output_paths(source, epsilons, output_dir, fmt):
+    """
+    Output file of every epsilon; the epsilon is part of the name only when several are requested.
+    """
+    name = os.path.basename(source)
+    if len(epsilons) == 1:
+        return [os.path.join(output_dir, name + FORMATS[fmt])]
+    return [os.path.join(output_dir, f'{name}.eps{epsilon:g}{FORMATS[fmt]}') for epsilon in epsilons]
+
+
+def is_up_to_date(source, paths):
+    source_mtime = os.stat(source).st_mtime
+    return all(os.path.exists(path) and os.stat(path).st_mtime >= source_mtime for path in paths)
+
+
+def write_reprint(df, path, fmt):
+    if fmt == 'tsv':
+        df.to_csv(path, sep='\t')
+    elif fmt == 'csv':
+        df.to_csv(path)
+    else:
+        np.savez(path, values=df.to_numpy(), index=np.array(list(map(str, df.index))),
+                 columns=np.array(list(map(str, df.columns))))
+
+
+def process_file(source, epsilons, paths, fmt):
+    """
+    Computes the RePrint of one signature matrix at every epsilon in one pass and writes each.
+    """
+    data = read_reference(source)
+    for values, path in zip(reprint_sweep(data, epsilons), paths):
+        write_reprint(pd.DataFrame(values, index=data.index.rename(None), columns=data.columns), path, fmt)
+    return data.shape[1]
+
+
+def expand_inputs(patterns):
+    sources = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        sources += [path for path in matches if os.path.isfile(path) and path not in sources]
+    return sources
+
+
+def run_batch(sources, epsilons, output_dir, fmt, jobs, force):
+    """
+    Spreads the files over a process pool and reports progress as each one finishes.
+    Returns the number of files that failed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = {}
+    for source in sources:
+        paths = output_paths(source, epsilons, output_dir, fmt)
+        if not force and is_up_to_date(source, paths):
+            print(f'skip {source} (up to date)')
+        else:
+            tasks[source] = paths
+
+    failed = 0
+    total = len(tasks)
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(process_file, source, epsilons, paths, fmt): source for source, paths in tasks.items()}
+        for done, future in enumerate(as_completed(futures), start=1):
+            source = futures[future]
+            try:
+                n_signatures = future.result()
+                print(f'[{done}/{total}] {source}: {n_signatures} signatures x {len(epsilons)} epsilons '
+                      f'({time.time() - start:.1f}s)')
+            except Exception as e:
+                failed += 1
+                print(f'[{done}/{total}] {source}: failed ({e})', file=sys.stderr)
+    return failed
 
 
-# Extracting mutation categories and their probabilities
-mutation_types = data['Type'].values
-signatures = data.columns[1:]
+def build_app_data(force=False):
+    os.chdir(ROOT)
 
-# Initialize a dictionary to store the RePrint probabilities for each signature
-reprint_probabilities = {signature: {} for signature in signatures}
+    # Signature names shown in the page dropdowns (data/signature_headers.json is committed)
+    build_header_index()
 
-# Iterate over each signature
-for signature in signatures:
-    # Extract the probabilities for the current signature
-    signature_probs = data[signature].values
+    # Memory-mapped binary copies of the bundled text files, loaded by utils.references.load_reference
+    convert_references(verbose=True)
 
-    # Iterate over each mutation type
-    for idx, mutation in enumerate(mutation_types):
-        # Split the mutation type to extract NL, X, Y, NR
-        flanking_bases, mutation_info = mutation.split('[')
+    # Binary store of every bundled reference at every epsilon in EPSILONS, served by the callbacks
+    build_store(force=force, verbose=True)
 
-        NL = mutation[0]
-        NR = mutation[6]
-        X, Y = mutation[2], mutation[4]
 
-        # Compute the denominator: sum of probabilities for Z != X
-        denominator = np.sum([signature_probs[j] for j in range(len(mutation_types))
-                              if mutation_types[j].startswith(f"{NL}[{X}>") and mutation_types[j].endswith(f"]{NR}")
-                              and mutation_types[j][4] != X])
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compute RePrint matrices of signature files.')
+    parser.add_argument('inputs', nargs='*',
+                        help='signature files or glob patterns; without any, the app data is rebuilt')
+    parser.add_argument('-e', '--epsilon', type=float, nargs='+', default=[0.0],
+                        help='pseudo-counts to compute (default: 0, as in data/cosmic_reprints)')
+    parser.add_argument('-o', '--output-dir', default=os.path.join(ROOT, 'data', 'cosmic_reprints'))
+    parser.add_argument('-f', '--format', choices=sorted(FORMATS), default='tsv')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--force', action='store_true', help='recompute outputs and store entries that are up to date')
+    args = parser.parse_args(argv)
 
+    if not args.inputs:
+        build_app_data(args.force)
+        return 0
 
-        # Compute the RePrint probability for the current mutation
-        reprint_prob = signature_probs[idx] / denominator if denominator != 0 else 0
+    sources = expand_inputs(args.inputs)
+    if not sources:
+        parser.error('no input files matched')
+    failed = run_batch(sources, args.epsilon, args.output_dir, args.format, args.jobs, args.force)
+    return 1 if failed else 0
 
-        # Store the RePrint probability
-        reprint_probabilities[signature][mutation] = reprint_prob
 
-# Convert the reprint_probabilities dictionary to a DataFrame for better readability
-reprint_df = pd.DataFrame(reprint_probabilities)
-print(reprint_df.to_csv(f'cosmic_reprints/{name}.reprint', sep='\t'))
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,10 @@
+"""
+gunicorn settings, read from the working directory by the Procfile's `gunicorn app:server`.
+"""
+import os
+
+# Threaded workers keep reporting to the arbiter while a request streams a large download or image export,
+# where a sync worker would be killed after `timeout` seconds in the middle of the response
+worker_class = 'gthread'
+threads = int(os.environ.get('REPRINT_WEB_THREADS', 4))
+timeout = 30
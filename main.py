@@ -1,5 +1,7 @@
 from dash import Dash
 import dash_bootstrap_components as dbc
+from utils.jobs import background_callback_manager
 
-app = Dash(__name__, suppress_callback_exceptions=True, external_stylesheets=[dbc.themes.BOOTSTRAP])
+app = Dash(__name__, suppress_callback_exceptions=True, external_stylesheets=[dbc.themes.BOOTSTRAP],
+           background_callback_manager=background_callback_manager)
 
@@ -0,0 +1,89 @@
+from urllib.parse import urlencode
+
+import flask
+
+from main import app
+from utils.utils import FILES
+from utils.analysis import cached_reprint
+from utils.downloads import DOWNLOAD_FORMATS, matrix_chunks, pq
+from utils.references import load_reference
+from utils.reprint_store import reference_reprint
+from utils.upload_store import load_upload, UPLOAD_EXPIRED_MESSAGE
+
+download_format_options = [{'label': 'CSV', 'value': 'csv'},
+                           {'label': 'CSV (gzip)', 'value': 'csv.gz'},
+                           {'label': 'Parquet', 'value': 'parquet'}]
+
+
+def selection_query(selected_file, session, selected_signatures, options):
+    """
+    Query parameters naming the upload or reference file and the selected signatures in order.
+    A selection of every signature in file order is sent as all=1, which keeps links to large uploads short.
+    """
+    # Sessions stored before uploads moved server-side have no handle: the route then reports them expired
+    query = [('handle', session.get('handle') or '') if session is not None else ('file', selected_file)]
+    if selected_signatures and selected_signatures == [option['value'] for option in options or []]:
+        query.append(('all', 1))
+    else:
+        query += [('signature', signature) for signature in selected_signatures or []]
+    return query
+
+
+def query_signatures(args):
+    """
+    Signatures named by a selection_query: None for all of them, otherwise the list (possibly empty).
+    """
+    return None if args.get('all') else args.getlist('signature')
+
+
+def download_link(kind, download_format, selected_file, session, selected_signatures, options, epsilon=None):
+    """
+    URL of a /download/reprint or /download/signatures matrix of the current selection.
+    """
+    query = [('format', download_format)] + selection_query(selected_file, session, selected_signatures, options)
+    if epsilon is not None:
+        query.append(('epsilon', epsilon))
+    return f'/download/{kind}?' + urlencode(query)
+
+
+@app.server.route('/download/<kind>')
+def download_matrix(kind):
+    """
+    RePrint or signature matrix of an upload or reference file as CSV, gzip CSV or Parquet,
+    taken from the RePrint store or result cache and streamed a few rows at a time.
+    """
+    args = flask.request.args
+    download_format = args.get('format', 'csv')
+    handle = args.get('handle')
+    selected_file = args.get('file')
+    if kind not in ('reprint', 'signatures') or download_format not in DOWNLOAD_FORMATS \
+            or (handle is None and selected_file not in FILES):
+        flask.abort(400)
+    if download_format == 'parquet' and pq is None:
+        return 'Parquet downloads need the pyarrow package.', 501
+
+    if handle is not None:
+        df = load_upload(handle)
+        if df is None:
+            return UPLOAD_EXPIRED_MESSAGE, 404
+    else:
+        df = load_reference(f'data/signatures/{selected_file}')
+
+    try:
+        if kind == 'reprint':
+            epsilon = float(args['epsilon'])
+            if handle is not None:
+                df = cached_reprint(df, epsilon)
+            else:
+                df = reference_reprint(f'data/signatures/{selected_file}', epsilon, df)
+        signatures = query_signatures(args)
+        df = df if signatures is None else df[signatures]
+    except (KeyError, ValueError):
+        flask.abort(400)
+
+    if kind == 'reprint':
+        df = df.add_prefix('reprint_')
+    content_type, extension = DOWNLOAD_FORMATS[download_format]
+    filename = ('reprints' if kind == 'reprint' else 'signatures') + extension
+    return flask.Response(matrix_chunks(df, download_format), mimetype=content_type,
+                          headers={'Content-Disposition': f'attachment; filename={filename}'})
@@ -1,315 +1,364 @@
-from utils.figpanel import create_heatmap_with_custom_sim
-from utils.utils import FILES, DEFAULT_SIGNATURES, linkage_methods, DEFAULT_LINKAGE_METHOD, reprint, calculate_rmse, calculate_cosine, calculate_js_divergence
+import functools
+from utils.figpanel import LARGE_HEATMAP, create_heatmap_with_custom_sim, create_epsilon_sensitivity_plot, precompute_heatmap_linkages, heatmap_zoom
+from utils.utils import FILES, DEFAULT_SIGNATURES, linkage_methods, DEFAULT_LINKAGE_METHOD, calculate_rmse, calculate_cosine, calculate_js_divergence
 from main import app
-from dash import dcc, html, Input, Output, State, ctx
+from dash import dcc, html, Input, Output, State, Patch, ctx
 import dash_bootstrap_components as dbc
 from pages.nav import navbar
-import pandas as pd
 import plotly.graph_objects as go
+from utils.reprint_store import reference_reprint
+from utils.references import load_reference, signature_names
+from utils.analysis import cached_reprint
+from utils.cache import cached_figure, submit_figure, content_hash
+from utils.upload_store import save_upload, load_upload, session_upload, UPLOAD_EXPIRED_MESSAGE
+from pages.downloads import download_format_options, download_link
 
 
 
 
 data = {}
 for file in FILES:
-    data[file] = pd.read_csv(f'data/signatures/{file}', sep='\t').columns[1:].to_list()
+    data[file] = signature_names(f'data/signatures/{file}')
+
+functions = {'rmse': calculate_rmse, 'cosine': calculate_cosine, 'js_divergence': calculate_js_divergence}
 
 dropdown_options = [{'label': file, 'value': file} for file in FILES]
 
 
 # Application layout
-page1_layout = html.Div([
-    navbar,
-    dbc.Alert(
-        [
-            html.H5("How to Use This Dashboard", className="mb-3"),
-
-            html.H6("1. Workflow Steps", className="mt-2"),
-            html.Ol([
-                html.Li("Select a reference signature file from the first dropdown (e.g., COSMIC)."),
-                html.Li("Optionally upload your own query signatures using the drag-and-drop box."),
-                html.Li("Adjust advanced options (distance metric, clustering, epsilon), if needed."),
-                html.Li([
-                    html.Strong("Click "), "the ",
-                    html.Strong("Reload heatmaps"),
-                    " button to generate the analysis and update the plots."
-                ])
-            ], style={"font-size": "15px"}),
+@functools.lru_cache(maxsize=None)
+def page1_layout():
+    return html.Div([
+        navbar,
+        dbc.Alert(
+            [
+                html.H5("How to Use This Dashboard", className="mb-3"),
+
+                html.H6("1. Workflow Steps", className="mt-2"),
+                html.Ol([
+                    html.Li("Select a reference signature file from the first dropdown (e.g., COSMIC)."),
+                    html.Li("Optionally upload your own query signatures using the drag-and-drop box."),
+                    html.Li("Adjust advanced options (distance metric, clustering, epsilon), if needed."),
+                    html.Li([
+                        html.Strong("Click "), "the ",
+                        html.Strong("Reload heatmaps"),
+                        " button to generate the analysis and update the plots."
+                    ])
+                ], style={"font-size": "15px"}),
 
 
-            html.H6("Distance Metrics", className="mt-4"),
-            html.Ul([
-                html.Li("Cosine: Measures angular similarity between signatures", style={"font-size": "14px"}),
-                html.Li("RMSE: Root mean square error between normalized signatures", style={"font-size": "14px"}),
-                html.Li("JS Divergence: Jensen-Shannon divergence (symmetric version of Kullback-Leibler divergence)", style={"font-size": "14px"}),
-            ]),
+                html.H6("Distance Metrics", className="mt-4"),
+                html.Ul([
+                    html.Li("Cosine: Measures angular similarity between signatures", style={"font-size": "14px"}),
+                    html.Li("RMSE: Root mean square error between normalized signatures", style={"font-size": "14px"}),
+                    html.Li("JS Divergence: Jensen-Shannon divergence (symmetric version of Kullback-Leibler divergence)", style={"font-size": "14px"}),
+                ]),
 
-            html.H6("Downloads", className="mt-4"),
-            html.Ul([
-                html.Li("Download RePrint matrix as CSV", style={"font-size": "14px"}),
-                html.Li("Download original signature matrix", style={"font-size": "14px"}),
-            ])
-        ],
-        color="secondary",
-        dismissable=True,
-        style={"margin-top": "25px", "font-size": "15px", "background-color": "#f8f9fa",
-               "border": "1px solid #ced4da", "padding": "20px"}
-    ),
-    dbc.Container([
-        dbc.Card(
-            [
-                dbc.CardHeader("Actions"),
-                dbc.CardBody(
-                    dbc.Row(
-                        [
-                            dbc.Col(
-                                [
-                                    dbc.Button(
-                                        "Advanced Options",
-                                        id="toggle-button",
-                                        color="dark",
-                                        className="w-100"
-                                    ),
-                                    dbc.Tooltip(
-                                        "Show or hide advanced settings",
-                                        target="toggle-button",
-                                        placement="bottom"
-                                    )
-                                ],
-                                width=2
-                            ),
-                            dbc.Col(
-                                [
-                                    dbc.Button(
-                                        "Download Reprints",
-                                        id="btn_csv-1",
-                                        color="info",
-                                        className="w-100"
-                                    ),
-                                    dbc.Tooltip(
-                                        "Download CSV file with reprint data",
-                                        target="btn_csv-1",
-                                        placement="bottom"
-                                    )
-                                ],
-                                width=2
-                            ),
-                            dbc.Col(
-                                [
-                                    dbc.Button(
-                                        "Download Signatures",
-                                        id="btn_csv-signatures",
-                                        color="secondary",
-                                        className="w-100"
-                                    ),
-                                    dbc.Tooltip(
-                                        "Download CSV file with selected signature data",
-                                        target="btn_csv-signatures",
-                                        placement="bottom"
-                                    )
-                                ],
-                                width=2
-                            ),
-                            dbc.Col(
-                                [
-                                    dbc.Button(
-                                        "Reload heatmaps",
-                                        id="submit-button",
-                                        color="primary",
-                                        className="w-100"
-                                    ),
-                                    dbc.Tooltip(
-                                        "Start the analysis pipeline",
-                                        target="submit-button",
-                                        placement="bottom",
-                                        id="tooltip-button",
-                                        style={"display": "none"}
-                                    )
-                                ],
-                                width=2
-                            ),
-                        ],
-                        className="mb-3",
-                        align="center"
-                    )
-                )
+                html.H6("Downloads", className="mt-4"),
+                html.Ul([
+                    html.Li("Download RePrint matrix as CSV, gzip CSV or Parquet", style={"font-size": "14px"}),
+                    html.Li("Download original signature matrix", style={"font-size": "14px"}),
+                ])
             ],
-            className="mb-4 shadow"
+            color="secondary",
+            dismissable=True,
+            style={"margin-top": "25px", "font-size": "15px", "background-color": "#f8f9fa",
+                   "border": "1px solid #ced4da", "padding": "20px"}
         ),
-        dbc.Collapse(
-            dbc.Card(dbc.CardBody([
-                dbc.Form([
-                    dbc.Row([
-                        dbc.Col([
-                            dbc.Label("Distance Metric", html_for="distance-metric"),
-                            dcc.Dropdown(
-                                id='distance-metric',
-                                options=[
-                                    {'label': 'Cosine', 'value': 'cosine'},
-                                    {'label': 'RMSE', 'value': 'rmse'},
-                                    {'label': 'JS Divergence', 'value': 'js_divergence'}
-                                ],
-                                placeholder="Select distance metric",
-                                value='rmse',
-                            ),
-                        ])
-                    ]),
-                    dbc.Row([
-                        dbc.Col([
-                            dbc.Label("Clustering Method", html_for="clustering-method"),
-                            dcc.Dropdown(
-                                id='clustering-method',
-                                options=[{'label': method.title(), 'value': method} for method in linkage_methods],
-                                placeholder="Select clustering method",
-                                value=DEFAULT_LINKAGE_METHOD,
-                                clearable=False,
-                            ),
-                        ])
-                    ]),
-                    dbc.Row([
-                        dbc.Col([
-                            dbc.Label("Epsilon (pseudo-count)", html_for="epsilon"),
-                            dbc.Input(
-                                type="number",
-                                id="epsilon",
-                                placeholder="Enter epsilon value",
-                                value=1e-4,
-                                min=1e-10,
-                                max=1e-2
-                            ),
-                            dbc.FormText(
-                                "Small pseudocount (ε) added to signature probabilities to reduce noise and avoid missing values due to rare mutations. Default: ε = 1e-4")
-                        ])
+        dbc.Container([
+            dbc.Card(
+                [
+                    dbc.CardHeader("Actions"),
+                    dbc.CardBody(
+                        dbc.Row(
+                            [
+                                dbc.Col(
+                                    [
+                                        dbc.Button(
+                                            "Advanced Options",
+                                            id="toggle-button",
+                                            color="dark",
+                                            className="w-100"
+                                        ),
+                                        dbc.Tooltip(
+                                            "Show or hide advanced settings",
+                                            target="toggle-button",
+                                            placement="bottom"
+                                        )
+                                    ],
+                                    width=2
+                                ),
+                                dbc.Col(
+                                    [
+                                        dbc.Button(
+                                            "Download Reprints",
+                                            id="btn_csv-1",
+                                            color="info",
+                                            className="w-100",
+                                            external_link=True
+                                        ),
+                                        dbc.Tooltip(
+                                            "Download the reprint data (CSV, gzip CSV or Parquet)",
+                                            target="btn_csv-1",
+                                            placement="bottom"
+                                        )
+                                    ],
+                                    width=2
+                                ),
+                                dbc.Col(
+                                    [
+                                        dbc.Button(
+                                            "Download Signatures",
+                                            id="btn_csv-signatures",
+                                            color="secondary",
+                                            className="w-100",
+                                            external_link=True
+                                        ),
+                                        dbc.Tooltip(
+                                            "Download the selected signature data (CSV, gzip CSV or Parquet)",
+                                            target="btn_csv-signatures",
+                                            placement="bottom"
+                                        )
+                                    ],
+                                    width=2
+                                ),
+                                dbc.Col(
+                                    [
+                                        dbc.Button(
+                                            "Reload heatmaps",
+                                            id="submit-button",
+                                            color="primary",
+                                            className="w-100"
+                                        ),
+                                        dbc.Tooltip(
+                                            "Start the analysis pipeline",
+                                            target="submit-button",
+                                            placement="bottom",
+                                            id="tooltip-button",
+                                            style={"display": "none"}
+                                        )
+                                    ],
+                                    width=2
+                                ),
+                            ],
+                            className="mb-3",
+                            align="center"
+                        )
+                    )
+                ],
+                className="mb-4 shadow"
+            ),
+            dbc.Collapse(
+                dbc.Card(dbc.CardBody([
+                    dbc.Form([
+                        dbc.Row([
+                            dbc.Col([
+                                dbc.Label("Distance Metric", html_for="distance-metric"),
+                                dcc.Dropdown(
+                                    id='distance-metric',
+                                    options=[
+                                        {'label': 'Cosine', 'value': 'cosine'},
+                                        {'label': 'RMSE', 'value': 'rmse'},
+                                        {'label': 'JS Divergence', 'value': 'js_divergence'}
+                                    ],
+                                    placeholder="Select distance metric",
+                                    value='rmse',
+                                ),
+                            ])
+                        ]),
+                        dbc.Row([
+                            dbc.Col([
+                                dbc.Label("Clustering Method", html_for="clustering-method"),
+                                dcc.Dropdown(
+                                    id='clustering-method',
+                                    options=[{'label': method.title(), 'value': method} for method in linkage_methods],
+                                    placeholder="Select clustering method",
+                                    value=DEFAULT_LINKAGE_METHOD,
+                                    clearable=False,
+                                ),
+                            ])
+                        ]),
+                        dbc.Row([
+                            dbc.Col([
+                                dbc.Label("Epsilon (pseudo-count)", html_for="epsilon"),
+                                dbc.Input(
+                                    type="number",
+                                    id="epsilon",
+                                    placeholder="Enter epsilon value",
+                                    value=1e-4,
+                                    min=1e-10,
+                                    max=1e-2
+                                ),
+                                dbc.FormText(
+                                    "Small pseudocount (ε) added to signature probabilities to reduce noise and avoid missing values due to rare mutations. Default: ε = 1e-4")
+                            ])
+                        ]),
+                        dbc.Row([
+                            dbc.Col([
+                                dbc.Label("Download format", html_for="download-format-1"),
+                                dbc.RadioItems(
+                                    id="download-format-1",
+                                    options=download_format_options,
+                                    value='csv',
+                                    inline=True
+                                ),
+                            ])
+                        ]),
+                        dbc.Row([
+                            dbc.Col([
+                                dbc.Button(
+                                    "Epsilon sensitivity",
+                                    id="sensitivity-button",
+                                    color="secondary",
+                                    size="sm",
+                                    className="mt-3"
+                                ),
+                                dbc.FormText(
+                                    " How much the RePrint distances and clustering of the selected signatures change between ε = 1e-8 and 1e-2, compared with the chosen ε.")
+                            ])
+                        ]),
+                        html.Div([
+                            dbc.Progress(id='progress-sensitivity', value=0, striped=True, animated=True, className="mb-2"),
+                            dbc.Button("Cancel", id="cancel-button-sensitivity", color="secondary", size="sm"),
+                        ], id='progress-container-sensitivity', style={'display': 'none'}, className="mt-3"),
+                        dcc.Loading(
+                            id="loading-sensitivity-plot",
+                            type="default",
+                            children=dcc.Graph(id='sensitivity-plot', style={'display': 'none'})
+                        )
                     ])
-                ])
-            ])),
-            id="collapse-form"
-        ),
-        html.Div(id='form-output')
-    ], fluid=True),
-    dbc.Container([
-        dbc.Row([
-        dcc.Dropdown(
-            id='dropdown-1',
-            options=dropdown_options,
-            disabled=False,
-            value=DEFAULT_SIGNATURES
-        ),
-        dcc.Dropdown(
-                id='signatures-dropdown-1',
-                options=[{'label': k, 'value': k} for k in data.keys()],
-                multi=True,
-                value=[k for k in data[DEFAULT_SIGNATURES]],
-            )
-    ]),
-        dbc.Alert(
-        [
-            html.H5("Expected File Format", style={"font-size": "18px", "font-weight": "bold"}),
-            html.P("The uploaded file should be a tab-separated file (.txt) containing mutation types and corresponding mutation signatures.",
-                style={"font-size": "14px"}),
-            html.P("Columns:", style={"font-size": "14px", "margin-bottom": "5px"}),
-            html.Ul([
-                html.Li("Type: Mutation type (e.g., A[C>A]A, A[C>A]C, ...).", style={"font-size": "13px"}),
-                html.Li("SBS1, SBS2, ..., SBSN: Signature mutation values (frequencies or probabilities).", style={"font-size": "13px"})
-            ], style={"padding-left": "20px", "margin-bottom": "5px"}),
-            html.P("Example first few rows:", style={"font-size": "14px", "margin-bottom": "5px"}),
-            html.Pre(
-                "Type\tSBS1\tSBS2\tSBS3\n"
-                "A[C>A]A\t0.001\t0.002\t0.003\n"
-                "A[C>A]C\t0.004\t0.005\t0.006",
-                style={"white-space": "pre-wrap", "font-family": "monospace", "font-size": "12px", "background-color": "#f8f9fa", "padding": "5px"}
+                ])),
+                id="collapse-form"
             ),
-        ],
-        color="info",
-        dismissable=True,
-        style={"font-size": "14px", "padding": "10px"}
-    ),
-    dcc.Upload(
-            id='upload-data-1-signatures',
-            children=html.Div(['Drag and drop your signatures']),
-            style={
-                'width': '300px',
-                'height': '60px',
-                'lineHeight': '60px',
-                'borderWidth': '1px',
-                'borderStyle': 'dashed',
-                'borderRadius': '5px',
-                'textAlign': 'center',
-                'margin': '10px'
-            },
-            multiple=False
-        ),
-    html.Div(id='upload-error-message-1'),
-    html.Div(id='info_uploader'),
-    dcc.Store(id='session-1-signatures', storage_type='session', data=None),
-    dbc.Row([
-        dbc.Col(html.Label("Hide Heatmap:", className="h5"), width="auto"),
-        dbc.Col(
-            dbc.Switch(
-                id="toggle-heatmap",
-                value=False,
-                label="On/Off",
-                className="mb-3"
+            html.Div(id='form-output'),
+            html.Div([
+                dbc.Progress(id='progress-1', value=0, striped=True, animated=True, className="mb-2"),
+                dbc.Button("Cancel", id="cancel-button-1", color="secondary", size="sm"),
+            ], id='progress-container-1', style={'display': 'none'}, className="mb-3")
+        ], fluid=True),
+        dbc.Container([
+            dbc.Row([
+            dcc.Dropdown(
+                id='dropdown-1',
+                options=dropdown_options,
+                disabled=False,
+                value=DEFAULT_SIGNATURES
             ),
-            width="auto"
+            dcc.Dropdown(
+                    id='signatures-dropdown-1',
+                    options=[{'label': k, 'value': k} for k in data.keys()],
+                    multi=True,
+                    value=[k for k in data[DEFAULT_SIGNATURES]],
+                )
+        ]),
+            dbc.Alert(
+            [
+                html.H5("Expected File Format", style={"font-size": "18px", "font-weight": "bold"}),
+                html.P("The uploaded file should be a tab-separated file (.txt) containing mutation types and corresponding mutation signatures.",
+                    style={"font-size": "14px"}),
+                html.P("Columns:", style={"font-size": "14px", "margin-bottom": "5px"}),
+                html.Ul([
+                    html.Li("Type: Mutation type (e.g., A[C>A]A, A[C>A]C, ...).", style={"font-size": "13px"}),
+                    html.Li("SBS1, SBS2, ..., SBSN: Signature mutation values (frequencies or probabilities).", style={"font-size": "13px"})
+                ], style={"padding-left": "20px", "margin-bottom": "5px"}),
+                html.P("Example first few rows:", style={"font-size": "14px", "margin-bottom": "5px"}),
+                html.Pre(
+                    "Type\tSBS1\tSBS2\tSBS3\n"
+                    "A[C>A]A\t0.001\t0.002\t0.003\n"
+                    "A[C>A]C\t0.004\t0.005\t0.006",
+                    style={"white-space": "pre-wrap", "font-family": "monospace", "font-size": "12px", "background-color": "#f8f9fa", "padding": "5px"}
+                ),
+            ],
+            color="info",
+            dismissable=True,
+            style={"font-size": "14px", "padding": "10px"}
         ),
-    ], className="mb-4"),
-    dbc.Row([
-        dbc.Col([
-            html.H5("Signature Similarity"),
-            dcc.Loading(
-                id="loading-heatmap-plot",
-                type="default",
-                children=dcc.Graph(
-                    id='heatmap-plot',
-                    config={
-                        'displayModeBar': True,
-                        'displaylogo': False,
-                        'modeBarButtonsToAdd': [
-                            'toImage'
-                        ],
-                        'toImageButtonOptions': {
-                            'format': 'png',
-                            'filename': 'signature_similarity_heatmap',
-                            'height': 600,
-                            'width': 800,
-                            'scale': 2
+        dcc.Upload(
+                id='upload-data-1-signatures',
+                children=html.Div(['Drag and drop your signatures']),
+                style={
+                    'width': '300px',
+                    'height': '60px',
+                    'lineHeight': '60px',
+                    'borderWidth': '1px',
+                    'borderStyle': 'dashed',
+                    'borderRadius': '5px',
+                    'textAlign': 'center',
+                    'margin': '10px'
+                },
+                multiple=False
+            ),
+        html.Div(id='upload-error-message-1'),
+        html.Div(id='info_uploader'),
+        dcc.Store(id='session-1-signatures', storage_type='session', data=None),
+        # Parameters of the heatmaps on screen, for zooming into large ones
+        dcc.Store(id='heatmap-view-1', data=None),
+        dbc.Row([
+            dbc.Col(html.Label("Hide Heatmap:", className="h5"), width="auto"),
+            dbc.Col(
+                dbc.Switch(
+                    id="toggle-heatmap",
+                    value=False,
+                    label="On/Off",
+                    className="mb-3"
+                ),
+                width="auto"
+            ),
+        ], className="mb-4"),
+        dbc.Row([
+            dbc.Col([
+                html.H5("Signature Similarity"),
+                dcc.Loading(
+                    id="loading-heatmap-plot",
+                    type="default",
+                    children=dcc.Graph(
+                        id='heatmap-plot',
+                        config={
+                            'displayModeBar': True,
+                            'displaylogo': False,
+                            'modeBarButtonsToAdd': [
+                                'toImage'
+                            ],
+                            'toImageButtonOptions': {
+                                'format': 'png',
+                                'filename': 'signature_similarity_heatmap',
+                                'height': 600,
+                                'width': 800,
+                                'scale': 2
+                            }
                         }
-                    }
+                    )
                 )
-            )
-        ]),
-        dbc.Col([
-            html.H5("RePrint Similarity"),
-            dcc.Loading(
-                id="loading-heatmap-reprint-plot",
-                type="default",
-                children=dcc.Graph(
-                    id='heatmap-reprint-plot',
-                    config={
-                        'displayModeBar': True,
-                        'displaylogo': False,
-                        'modeBarButtonsToAdd': [
-                            'toImage'
-                        ],
-                        'toImageButtonOptions': {
-                            'format': 'png',
-                            'filename': 'reprint_similarity_heatmap',
-                            'height': 600,
-                            'width': 800,
-                            'scale': 2
+            ]),
+            dbc.Col([
+                html.H5("RePrint Similarity"),
+                dcc.Loading(
+                    id="loading-heatmap-reprint-plot",
+                    type="default",
+                    children=dcc.Graph(
+                        id='heatmap-reprint-plot',
+                        config={
+                            'displayModeBar': True,
+                            'displaylogo': False,
+                            'modeBarButtonsToAdd': [
+                                'toImage'
+                            ],
+                            'toImageButtonOptions': {
+                                'format': 'png',
+                                'filename': 'reprint_similarity_heatmap',
+                                'height': 600,
+                                'width': 800,
+                                'scale': 2
+                            }
                         }
-                    }
+                    )
                 )
-            )
-        ])
-    ]),
-    dcc.Location(id='url-page1', refresh=False),
-    dcc.Download(id="download-dataframe-csv-1"),
-    dcc.Download(id="download-dataframe-csv-signatures")
-    ], fluid=True),
+            ])
+        ]),
+        dcc.Location(id='url-page1', refresh=False),
+        ], fluid=True),
 
-])
+    ])
 
 from utils.utils import parse_signatures
 import dash
@@ -324,7 +373,7 @@ def update_output_signatures(contents, filename):
         df_signatures = parse_signatures(contents, filename)
 
         signatures_info = "Some information extracted from df_signatures"
-        return [{'signatures_data': df_signatures.to_dict('records'), 'filename': filename, 'info': signatures_info}]
+        return [{'handle': save_upload(df_signatures.set_index('Type')), 'filename': filename, 'info': signatures_info}]
     else:
         return dash.no_update
 
@@ -358,7 +407,8 @@ def toggle_collapse(n, is_open):
 @app.callback(
     [Output('form-output', 'children'),
      Output('heatmap-plot', 'figure'),
-     Output('heatmap-reprint-plot', 'figure')],
+     Output('heatmap-reprint-plot', 'figure'),
+     Output('heatmap-view-1', 'data')],
     [Input('submit-button', 'n_clicks'),
      Input("toggle-heatmap", "value")],
     [State('dropdown-1', 'value'),
@@ -367,46 +417,146 @@ def toggle_collapse(n, is_open):
      State('clustering-method', 'value'),
      State('epsilon', 'value'),
      State('session-1-signatures', 'data'),
-     ]
+     ],
+    # Runs in a job process so the web worker stays free while the analysis is computed
+    background=True,
+    running=[(Output('submit-button', 'disabled'), True, False),
+             (Output('progress-container-1', 'style'), {'display': 'block'}, {'display': 'none'})],
+    cancel=[Input('cancel-button-1', 'n_clicks')],
+    progress=[Output('progress-1', 'value'), Output('progress-1', 'label')],
 )
-def update_output(n_clicks, hide_heatmap, selected_file, selected_signatures, distance_metric, clustering_method, epsilon, signatures):
-    if n_clicks:
-        if signatures is not None:
-            data = pd.DataFrame(signatures['signatures_data'])
-            data.index = data['Type']
-            data = data.drop(columns='Type')[selected_signatures]
-            functions = {'rmse': calculate_rmse, 'cosine': calculate_cosine, 'js_divergence': calculate_js_divergence}
-            df_reprint = reprint(data, epsilon=epsilon)
-            return (f'Submitted: Distance Metric: {distance_metric}, Clustering Method: {clustering_method}, Epsilon: {epsilon}',
-                    create_heatmap_with_custom_sim(data, calc_func=functions[distance_metric], colorscale='YlGnBu', hide_heatmap=hide_heatmap, method=clustering_method),
-                    create_heatmap_with_custom_sim(df_reprint, calc_func=functions[distance_metric], colorscale='OrRd', hide_heatmap=hide_heatmap, method=clustering_method)
-                    )
-        else:
-            df_signatures = pd.read_csv(f"data/signatures/{selected_file}", sep='\t', index_col=0)[selected_signatures]
-            functions = {'rmse': calculate_rmse, 'cosine': calculate_cosine, 'js_divergence': calculate_js_divergence}
-            df_reprint = reprint(df_signatures, epsilon=epsilon)
-            return (f'Submitted: Distance Metric: {distance_metric}, Clustering Method: {clustering_method}, Epsilon: {epsilon}',
-                    create_heatmap_with_custom_sim(df_signatures, calc_func=functions[distance_metric], colorscale='YlGnBu', hide_heatmap=hide_heatmap, method=clustering_method),
-                    create_heatmap_with_custom_sim(df_reprint, calc_func=functions[distance_metric], colorscale='OrRd', hide_heatmap=hide_heatmap, method=clustering_method)
-                    )
+def update_output(set_progress, n_clicks, hide_heatmap, selected_file, selected_signatures, distance_metric, clustering_method, epsilon, signatures):
+    set_progress((10, 'Computing RePrints'))
+    view = {'file': selected_file, 'signatures': selected_signatures, 'metric': distance_metric,
+            'method': clustering_method, 'epsilon': epsilon, 'hide': hide_heatmap,
+            'handle': signatures.get('handle') if signatures else None}
+    message = f'Distance Metric: {distance_metric}, Clustering Method: {clustering_method}, Epsilon: {epsilon}'
+    if n_clicks or signatures is not None:
+        message = 'Submitted: ' + message
     else:
-        if signatures is not None:
-            data = pd.DataFrame(signatures['signatures_data'])
-            data.index = data['Type']
-            data = data.drop(columns='Type')[selected_signatures]
-            functions = {'rmse': calculate_rmse, 'cosine': calculate_cosine, 'js_divergence': calculate_js_divergence}
-            df_reprint = reprint(data, epsilon=epsilon)
-            return (f'Submitted: Distance Metric: {distance_metric}, Clustering Method: {clustering_method}, Epsilon: {epsilon}',
-                    create_heatmap_with_custom_sim(data, calc_func=functions[distance_metric], colorscale='YlGnBu', hide_heatmap=hide_heatmap, method=clustering_method),
-                    create_heatmap_with_custom_sim(df_reprint, calc_func=functions[distance_metric], colorscale='OrRd', hide_heatmap=hide_heatmap, method=clustering_method)
-                    )
-        else:
-            df_signatures = pd.read_csv(f"data/signatures/{selected_file}", sep='\t', index_col=0)[selected_signatures]
-            df_reprint = reprint(df_signatures, epsilon=epsilon)
-            return (f'Distance Metric: {distance_metric}, Clustering Method: {clustering_method}, Epsilon: {epsilon}',
-                    create_heatmap_with_custom_sim(df_signatures, colorscale='YlGnBu', hide_heatmap=hide_heatmap, method=clustering_method),
-                    create_heatmap_with_custom_sim(df_reprint, colorscale='OrRd', hide_heatmap=hide_heatmap, method=clustering_method)
-                    )
+        # Reference heatmaps drawn before a submit use RMSE whatever metric is selected
+        view['metric'] = 'rmse'
+    if signatures is not None:
+        source = session_upload(signatures)
+        if source is None:
+            return UPLOAD_EXPIRED_MESSAGE, go.Figure(), go.Figure(), None
+    else:
+        source = load_reference(f"data/signatures/{selected_file}")
+    signatures_figure, reprint_figure = heatmap_figures(set_progress, view, source, functions[view['metric']])
+    return message, signatures_figure, reprint_figure, view
+
+
+def heatmap_figures(set_progress, view, source, calc_func):
+    """
+    Signature and RePrint heatmaps of a heatmap view of source, its upload or reference matrix.
+    """
+    df_signatures = source[view['signatures']]
+    options = dict(calc_func=calc_func, hide_heatmap=view['hide'], method=view['method'])
+    # The signature panel is built on a panel thread while the RePrint panel is computed here
+    signatures_figure = submit_figure(create_heatmap_with_custom_sim, df_signatures, colorscale='YlGnBu',
+                                      scope=content_hash(source), **options)
+    # RePrint is column-independent: computed once for the whole matrix, then only selected
+    if view['handle'] is not None:
+        all_reprints = cached_reprint(source, view['epsilon'])
+    else:
+        all_reprints = reference_reprint(f"data/signatures/{view['file']}", view['epsilon'], source)
+    df_reprint = all_reprints[view['signatures']]
+    set_progress((50, 'Clustering'))
+    reprint_figure = cached_figure(create_heatmap_with_custom_sim, df_reprint, colorscale='OrRd',
+                                   scope=content_hash(all_reprints), **options)
+    signatures_figure = signatures_figure.result()
+    # With REPRINT_PRECOMPUTE_LINKAGES=1 the other clustering methods are built here too, so switching method is a cache hit
+    precompute_heatmap_linkages(df_signatures, calc_func, scope=content_hash(source))
+    precompute_heatmap_linkages(df_reprint, calc_func, scope=content_hash(all_reprints))
+    return signatures_figure, reprint_figure
+
+
+def view_frames(view):
+    """
+    Signature and RePrint matrices of the selected signatures of a heatmap view, each with the hash of
+    the full matrix it was clustered in; None when its upload has expired.
+    """
+    if view['handle'] is not None:
+        source = load_upload(view['handle'])
+        if source is None:
+            return None
+        all_reprints = cached_reprint(source, view['epsilon'])
+    else:
+        source = load_reference(f"data/signatures/{view['file']}")
+        all_reprints = reference_reprint(f"data/signatures/{view['file']}", view['epsilon'], source)
+    return ((source[view['signatures']], content_hash(source)),
+            (all_reprints[view['signatures']], content_hash(all_reprints)))
+
+
+def zoom_heatmap(relayout, view, panel):
+    if not view or view['hide'] or len(view['signatures']) <= LARGE_HEATMAP:
+        return dash.no_update
+    frames = view_frames(view)
+    if frames is None:
+        return dash.no_update
+    df, scope = frames[panel]
+    heatmap = heatmap_zoom(df, relayout, calc_func=functions[view['metric']], method=view['method'], scope=scope)
+    if heatmap is None:
+        return dash.no_update
+    figure = Patch()
+    figure['data'][0].update(heatmap)
+    return figure
+
+
+@app.callback(
+    Output('heatmap-plot', 'figure', allow_duplicate=True),
+    Input('heatmap-plot', 'relayoutData'),
+    State('heatmap-view-1', 'data'),
+    prevent_initial_call=True
+)
+def zoom_signature_heatmap(relayout, view):
+    return zoom_heatmap(relayout, view, 0)
+
+
+@app.callback(
+    Output('heatmap-reprint-plot', 'figure', allow_duplicate=True),
+    Input('heatmap-reprint-plot', 'relayoutData'),
+    State('heatmap-view-1', 'data'),
+    prevent_initial_call=True
+)
+def zoom_reprint_heatmap(relayout, view):
+    return zoom_heatmap(relayout, view, 1)
+
+
+@app.callback(
+    [Output('sensitivity-plot', 'figure'),
+     Output('sensitivity-plot', 'style')],
+    Input('sensitivity-button', 'n_clicks'),
+    [State('dropdown-1', 'value'),
+     State('signatures-dropdown-1', 'value'),
+     State('distance-metric', 'value'),
+     State('clustering-method', 'value'),
+     State('epsilon', 'value'),
+     State('session-1-signatures', 'data')],
+    prevent_initial_call=True,
+    # A RePrint, distance matrix and linkage per epsilon of the sweep: run as a job like update_output
+    background=True,
+    running=[(Output('sensitivity-button', 'disabled'), True, False),
+             (Output('progress-container-sensitivity', 'style'), {'display': 'block'}, {'display': 'none'})],
+    cancel=[Input('cancel-button-sensitivity', 'n_clicks')],
+    progress=[Output('progress-sensitivity', 'value'), Output('progress-sensitivity', 'label')],
+)
+def update_sensitivity(set_progress, n_clicks, selected_file, selected_signatures, distance_metric, clustering_method, epsilon, signatures):
+    if epsilon is None or not selected_signatures:
+        return dash.no_update, dash.no_update
+    set_progress((10, 'Loading signatures'))
+    if signatures is not None:
+        df_signatures = session_upload(signatures)
+        if df_signatures is None:
+            return dash.no_update, dash.no_update
+    else:
+        df_signatures = load_reference(f"data/signatures/{selected_file}")
+    set_progress((30, 'Comparing epsilons'))
+    # Every epsilon of the sweep comes from one broadcast over the cached group sums
+    figure = cached_figure(create_epsilon_sensitivity_plot, df_signatures[selected_signatures], epsilon=float(epsilon),
+                           calc_func=functions[distance_metric], method=clustering_method)
+    return figure, {'display': 'block'}
+
 
 @app.callback(
     [Output('signatures-dropdown-1', 'options'),
@@ -418,10 +568,8 @@ def update_output(n_clicks, hide_heatmap, selected_file, selected_signatures, di
      Input('session-1-signatures', 'data')]
 )
 def set_options(selected_category, contents):
-    if contents is not None:
-        df = pd.DataFrame(contents['signatures_data'])
-        df.index = df['Type']
-        df = df.drop(columns='Type')
+    df = session_upload(contents)
+    if df is not None:
         signatures = df.columns.to_list()
         return (
             [{'label': signature, 'value': signature} for signature in signatures],
@@ -432,59 +580,25 @@ def set_options(selected_category, contents):
     return ([{'label': f"{i}", 'value': i} for i in data[selected_category]],
             [i for i in data[selected_category]],
             {'display': 'block'},
-            'Not Uploaded')
+            'Not Uploaded' if contents is None else UPLOAD_EXPIRED_MESSAGE)
 
 
 @app.callback(
-    Output("download-dataframe-csv-1", "data"),
-    Input("btn_csv-1", "n_clicks"),
-    [State('signatures-dropdown-1', 'value'),
-     State('dropdown-1', 'value'),
-     State('epsilon', 'value'),
-     State('session-1-signatures', 'data')],
-    prevent_initial_call=True
+    Output("btn_csv-1", "href"),
+    Output("btn_csv-signatures", "href"),
+    Input('download-format-1', 'value'),
+    Input('signatures-dropdown-1', 'value'),
+    Input('dropdown-1', 'value'),
+    Input('epsilon', 'value'),
+    Input('session-1-signatures', 'data'),
+    State('signatures-dropdown-1', 'options')
 )
-def download_dataframe(n_clicks, selected_signatures, selected_file, epsilon, contents):
-    if contents is not None:
-        df_signatures = pd.DataFrame(contents['signatures_data'])
-        df_signatures.index = df_signatures['Type']
-        df_signatures = df_signatures.drop(columns='Type')[selected_signatures]
-        df_reprint = reprint(df_signatures, epsilon=epsilon)
-
-        df_reprint.columns = [f"reprint_{col}" for col in df_reprint.columns]
-
-        return dcc.send_data_frame(df_reprint.to_csv, filename="reprints.csv")
-    else:
-        df_signatures = pd.read_csv(f"data/signatures/{selected_file}", sep='\t', index_col=0)[selected_signatures]
-        df_reprint = reprint(df_signatures, epsilon=epsilon)
-
-        df_reprint.columns = [f"reprint_{col}" for col in df_reprint.columns]
-
-        return dcc.send_data_frame(df_reprint.to_csv, filename="reprints.csv")
+def update_download_links(download_format, selected_signatures, selected_file, epsilon, contents, options):
+    return (download_link('reprint', download_format, selected_file, contents, selected_signatures, options, epsilon),
+            download_link('signatures', download_format, selected_file, contents, selected_signatures, options))
 
 
 from dash import dcc, Input, Output, State
-import pandas as pd
-
-@app.callback(
-    Output("download-dataframe-csv-signatures", "data"),
-    Input("btn_csv-signatures", "n_clicks"),
-    [State('signatures-dropdown-1', 'value'),
-     State('dropdown-1', 'value'),
-     State('session-1-signatures', 'data')],
-    prevent_initial_call=True
-)
-def download_signatures_only(n_clicks, selected_signatures, selected_file, contents):
-    if contents is not None:
-        # data from session
-        df_signatures = pd.DataFrame(contents['signatures_data'])
-        df_signatures.index = df_signatures['Type']
-        df_signatures = df_signatures.drop(columns='Type')[selected_signatures]
-    else:
-        # data from file
-        df_signatures = pd.read_csv(f"data/signatures/{selected_file}", sep='\t', index_col=0)[selected_signatures]
-
-    return dcc.send_data_frame(df_signatures.to_csv, filename="signatures.csv")
 
 @app.callback(
     Output("submit-button", "color"),
@@ -503,7 +617,8 @@ def highlight_button_on_dropdown_change(dropdown_values, n_clicks):
 
 @app.callback(
     [Output('heatmap-plot', 'figure', allow_duplicate=True),
-     Output('heatmap-reprint-plot', 'figure', allow_duplicate=True)],
+     Output('heatmap-reprint-plot', 'figure', allow_duplicate=True),
+     Output('heatmap-view-1', 'data', allow_duplicate=True)],
     [Input('distance-metric', 'value'),
      Input('clustering-method', 'value'),
      Input('epsilon', 'value')],
@@ -527,4 +642,4 @@ def clear_plots_on_parameter_change(distance_metric, clustering_method, epsilon)
         plot_bgcolor='rgba(0,0,0,0)',
         paper_bgcolor='rgba(0,0,0,0)'
     )
-    return empty_fig, empty_fig
\ No newline at end of file
+    return empty_fig, empty_fig, None
\ No newline at end of file
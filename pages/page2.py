@@ -1,245 +1,316 @@
-from utils.figpanel import create_main_dashboard
+import functools
+import itertools
+from urllib.parse import urlencode
+import flask
+from utils.figpanel import bar_axes, bar_panels, create_main_dashboards
+from utils.export import EXPORT_FORMATS, export_images, export_available
+from pages.downloads import download_format_options, download_link, selection_query, query_signatures
 from dash import dcc, html
 from main import app
-from dash import Input, Output, State
+from dash import Input, Output, State, MATCH, Patch, ClientsideFunction
 import dash_bootstrap_components as dbc
 from pages.nav import navbar
-import pandas as pd
-from utils.utils import FILES, DEFAULT_SIGNATURES, reprint, parse_signatures
+from utils.utils import FILES, DEFAULT_SIGNATURES, parse_signatures
+from utils.reprint_store import reference_reprint
+from utils.analysis import cached_reprint
+from utils.references import load_reference, signature_names
+from utils.upload_store import save_upload, session_upload, UPLOAD_EXPIRED_MESSAGE
 import dash
-import plotly.graph_objects as go
 
 
 data = {}
 
 for file in FILES:
-    data[file] = pd.read_csv(f'data/signatures/{file}', sep='\t').columns[1:].to_list()
+    data[file] = signature_names(f'data/signatures/{file}')
 
 dropdown_options = [{'label': file, 'value': file} for file in FILES]
 
 # Application layout
-page2_layout = html.Div([
-    navbar,
-dbc.Alert(
-    [
-        html.H5("How to Use This Dashboard", className="mb-3"),
-
-        html.H6("Workflow", className="mt-2"),
-        html.Ol([
-            html.Li("Choose a reference signature file from the first dropdown (e.g., COSMIC)."),
-            html.Li("Optionally upload your own mutational signatures (.txt format)."),
-            html.Li("Select the signatures to visualize from the second dropdown."),
-        ], style={"font-size": "15px"}),
-
-        html.Div("The plots will NOT update automatically. You must click 'Generate Plots' to refresh visualizations.", style={"color": "black", "font-weight": "bold"}),
-
-        html.H6("Plot Display", className="mt-4"),
-        html.P("For each selected signature, two side-by-side bar charts are displayed:", style={"font-size": "15px"}),
-        html.Ul([
-            html.Li("Left: Original signature (mutation frequencies)", style={"font-size": "14px"}),
-            html.Li("Right: RePrint-transformed representation (functional footprint)", style={"font-size": "14px"}),
-        ]),
-        html.P("Use the navigation buttons at the bottom to browse through paginated results (5 plots per page).", style={"font-size": "15px"}),
+@functools.lru_cache(maxsize=None)
+def page2_layout():
+    export_style = None if export_available() else {'display': 'none'}
+    return html.Div([
+        navbar,
+    dbc.Alert(
+        [
+            html.H5("How to Use This Dashboard", className="mb-3"),
 
-        html.H6("Advanced Options", className="mt-4"),
-        html.P("You can optionally adjust the epsilon (ε) parameter using the 'Advanced Options' toggle. "
-               "This value is added to frequencies to reduce noise and avoid zero values.", style={"font-size": "15px"}),
+            html.H6("Workflow", className="mt-2"),
+            html.Ol([
+                html.Li("Choose a reference signature file from the first dropdown (e.g., COSMIC)."),
+                html.Li("Optionally upload your own mutational signatures (.txt format)."),
+                html.Li("Select the signatures to visualize from the second dropdown."),
+            ], style={"font-size": "15px"}),
 
-        html.H6(" Downloads", className="mt-4"),
-        html.Ul([
-            html.Li("Download transformed RePrint data as CSV", style={"font-size": "14px"}),
-            html.Li("Download selected raw signature data", style={"font-size": "14px"}),
-        ]),
-    ],
-    color="secondary",
-    dismissable=True,
-    style={
-        "margin-top": "25px",
-        "font-size": "15px",
-        "background-color": "#f8f9fa",
-        "border": "1px solid #ced4da",
-        "padding": "20px"
-    }
-),
-    dcc.Interval(id='initial-load', interval=1000, n_intervals=0, max_intervals=1),
-    dbc.Container([
-    dbc.Card(
-    [
-        dbc.CardHeader("Actions"),
-        dbc.CardBody(
-            dbc.Row(
-                [
-                    dbc.Col(
-                        [
-                            dbc.Button(
-                                "Advanced Options",
-                                id="toggle-button-2",
-                                color="dark",
-                                className="w-100"
-                            ),
-                            dbc.Tooltip(
-                                "Show or hide advanced settings",
-                                target="toggle-button-2",
-                                placement="bottom"
-                            )
-                        ],
-                        width=2
-                    ),
-                    dbc.Col(
-                        [
-                            dbc.Button(
-                                "Download Reprints",
-                                id="btn_csv-2",
-                                color="info",
-                                className="w-100"
+            html.Div("The plots will NOT update automatically. You must click 'Generate Plots' to refresh visualizations.", style={"color": "black", "font-weight": "bold"}),
+
+            html.H6("Plot Display", className="mt-4"),
+            html.P("For each selected signature, two side-by-side bar charts are displayed:", style={"font-size": "15px"}),
+            html.Ul([
+                html.Li("Left: Original signature (mutation frequencies)", style={"font-size": "14px"}),
+                html.Li("Right: RePrint-transformed representation (functional footprint)", style={"font-size": "14px"}),
+            ]),
+            html.P("Use the navigation buttons at the bottom to browse through paginated results (5 plots per page).", style={"font-size": "15px"}),
+
+            html.H6("Advanced Options", className="mt-4"),
+            html.P("You can optionally adjust the epsilon (ε) parameter using the 'Advanced Options' toggle. "
+                   "This value is added to frequencies to reduce noise and avoid zero values.", style={"font-size": "15px"}),
+
+            html.H6(" Downloads", className="mt-4"),
+            html.Ul([
+                html.Li("Download transformed RePrint data as CSV, gzip CSV or Parquet", style={"font-size": "14px"}),
+                html.Li("Download selected raw signature data", style={"font-size": "14px"}),
+                html.Li("Export all selected plots as PNG, SVG or PDF images in one ZIP file", style={"font-size": "14px", **(export_style or {})}),
+            ]),
+        ],
+        color="secondary",
+        dismissable=True,
+        style={
+            "margin-top": "25px",
+            "font-size": "15px",
+            "background-color": "#f8f9fa",
+            "border": "1px solid #ced4da",
+            "padding": "20px"
+        }
+    ),
+        dcc.Interval(id='initial-load', interval=1000, n_intervals=0, max_intervals=1),
+        dbc.Container([
+        dbc.Card(
+        [
+            dbc.CardHeader("Actions"),
+            dbc.CardBody(
+                dbc.Row(
+                    [
+                        dbc.Col(
+                            [
+                                dbc.Button(
+                                    "Advanced Options",
+                                    id="toggle-button-2",
+                                    color="dark",
+                                    className="w-100"
+                                ),
+                                dbc.Tooltip(
+                                    "Show or hide advanced settings",
+                                    target="toggle-button-2",
+                                    placement="bottom"
+                                )
+                            ],
+                            width=2
+                        ),
+                        dbc.Col(
+                            [
+                                dbc.Button(
+                                    "Download Reprints",
+                                    id="btn_csv-2",
+                                    color="info",
+                                    className="w-100",
+                                    external_link=True
+                                ),
+                                dbc.Tooltip(
+                                    "Download the reprint data (CSV, gzip CSV or Parquet)",
+                                    target="btn_csv-2",
+                                    placement="bottom"
+                                )
+                            ],
+                            width=2
+                        ),
+                        dbc.Col(
+                            [
+                                dbc.Button(
+                                    "Download Signatures",
+                                    id="btn_csv-signatures-2",
+                                    color="secondary",
+                                    className="w-100",
+                                    external_link=True
+                                ),
+                                dbc.Tooltip(
+                                    "Download the selected signature data (CSV, gzip CSV or Parquet)",
+                                    target="btn_csv-signatures-2",
+                                    placement="bottom"
+                                )
+                            ],
+                            width=2
+                        ),
+                        dbc.Col(
+                            [
+                                dbc.Button(
+                                    "Generate Plots",
+                                    id="reload-button",
+                                    color="success",
+                                    className="w-100"
+                                ),
+                                dbc.Tooltip(
+                                    "Regenerate visualizations based on selected data",
+                                    target="reload-button",
+                                    placement="bottom",
+                                    id="tooltip-button-2",
+                                    style={"display": "block"}
+                                )
+                            ],
+                            width=2
+                        ),
+                        dbc.Col(
+                            [
+                                dbc.Button(
+                                    "Export Plots",
+                                    id="btn-export-2",
+                                    color="primary",
+                                    className="w-100",
+                                    external_link=True
+                                ),
+                                dbc.Tooltip(
+                                    "Download every selected signature and RePrint plot as images in a ZIP file",
+                                    target="btn-export-2",
+                                    placement="bottom"
+                                )
+                            ],
+                            width=2,
+                            # Hidden where kaleido cannot render
+                            style=export_style
+                        ),
+                    ],
+                    className="mb-3",
+                    align="center"
+                )
+            )
+        ],
+        className="mb-4 shadow"
+        ),
+        dbc.Collapse(
+            dbc.Card(dbc.CardBody([
+                dbc.Form([
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Label("Epsilon (pseudo-count)", html_for="epsilon"),
+                            dbc.Input(
+                                type="number",
+                                id="epsilon-2",
+                                placeholder="Enter epsilon value",
+                                value=1e-4,
+                                min=1e-10,
+                                max=1e-2
                             ),
-                            dbc.Tooltip(
-                                "Download CSV file with reprint data",
-                                target="btn_csv-2",
-                                placement="bottom"
-                            )
-                        ],
-                        width=2
-                    ),
-                    dbc.Col(
-                        [
-                            dbc.Button(
-                                "Download Signatures",
-                                id="btn_csv-signatures-2",
-                                color="secondary",
-                                className="w-100"
+                            dbc.FormText(
+                                "Small pseudocount (ε) added to signature probabilities to reduce noise and avoid missing values due to rare mutations. Default: ε = 1e-4")
+                        ]),
+                        dbc.Col([
+                            dbc.Label("Export format", html_for="export-format-2"),
+                            dbc.RadioItems(
+                                id="export-format-2",
+                                options=[{'label': fmt.upper(), 'value': fmt} for fmt in EXPORT_FORMATS],
+                                value='png',
+                                inline=True
                             ),
-                            dbc.Tooltip(
-                                "Download CSV file with selected signature data",
-                                target="btn_csv-signatures-2",
-                                placement="bottom"
-                            )
-                        ],
-                        width=2
-                    ),
-                    dbc.Col(
-                        [
-                            dbc.Button(
-                                "Generate Plots",
-                                id="reload-button",
-                                color="success",
-                                className="w-100"
+                            dbc.FormText("Image format of the files written by 'Export Plots'.")
+                        ], style=export_style),
+                        dbc.Col([
+                            dbc.Label("Download format", html_for="download-format-2"),
+                            dbc.RadioItems(
+                                id="download-format-2",
+                                options=download_format_options,
+                                value='csv',
+                                inline=True
                             ),
-                            dbc.Tooltip(
-                                "Regenerate visualizations based on selected data",
-                                target="reload-button",
-                                placement="bottom",
-                                id="tooltip-button-2",
-                                style={"display": "block"}
-                            )
-                        ],
-                        width=2
-                    ),
-                ],
-                className="mb-3",
-                align="center"
-            )
-        )
-    ],
-    className="mb-4 shadow"
-    ),
-    dbc.Collapse(
-        dbc.Card(dbc.CardBody([
-            dbc.Form([
-                dbc.Row([
-                    dbc.Col([
-                        dbc.Label("Epsilon (pseudo-count)", html_for="epsilon"),
-                        dbc.Input(
-                            type="number",
-                            id="epsilon-2",
-                            placeholder="Enter epsilon value",
-                            value=1e-4,
-                            min=1e-10,
-                            max=1e-2
-                        ),
-                        dbc.FormText(
-                            "Small pseudocount (ε) added to signature probabilities to reduce noise and avoid missing values due to rare mutations. Default: ε = 1e-4")
+                        ])
                     ])
                 ])
-            ])
-        ])),
-        id="collapse-form-2"
-    ),
-    dbc.Row([
-        dcc.Dropdown(
-            id='dropdown-2',
-            options=dropdown_options,
-            disabled=False,
-            value=DEFAULT_SIGNATURES
+            ])),
+            id="collapse-form-2"
         ),
-        dcc.Dropdown(
-                id='signatures-dropdown-2',
-                options=[{'label': k, 'value': k} for k in data.keys()],
-                multi=True,
-                value=[k for k in data[DEFAULT_SIGNATURES]],
+        dbc.Row([
+            dcc.Dropdown(
+                id='dropdown-2',
+                options=dropdown_options,
+                disabled=False,
+                value=DEFAULT_SIGNATURES
             ),
-    ]),
+            dcc.Dropdown(
+                    id='signatures-dropdown-2',
+                    options=[{'label': k, 'value': k} for k in data.keys()],
+                    multi=True,
+                    value=[k for k in data[DEFAULT_SIGNATURES]],
+                ),
+        ]),
 
-    dbc.Alert(
-        [
-            html.H5("Expected File Format", style={"font-size": "18px", "font-weight": "bold"}),
-            html.P("The uploaded file should be a tab-separated file (.txt) containing mutation types and corresponding mutation signatures.",
-                style={"font-size": "14px"}),
-            html.P("Columns:", style={"font-size": "14px", "margin-bottom": "5px"}),
-            html.Ul([
-                html.Li("Type: Mutation type (e.g., A[C>A]A, A[C>A]C, ...).", style={"font-size": "13px"}),
-                html.Li("SBS1, SBS2, ..., SBSN: Signature mutation values (frequencies or probabilities).", style={"font-size": "13px"})
-            ], style={"padding-left": "20px", "margin-bottom": "5px"}),
-            html.P("Example first few rows:", style={"font-size": "14px", "margin-bottom": "5px"}),
-            html.Pre(
-                "Type\tSBS1\tSBS2\tSBS3\n"
-                "A[C>A]A\t0.001\t0.002\t0.003\n"
-                "A[C>A]C\t0.004\t0.005\t0.006",
-                style={"white-space": "pre-wrap", "font-family": "monospace", "font-size": "12px", "background-color": "#f8f9fa", "padding": "5px"}
-            ),
-        ],
-        color="info",
-        dismissable=True,
-        style={"font-size": "14px", "padding": "10px"}
-    ),
-    dcc.Upload(
-            id='upload-data-2-signatures',
-            children=html.Div([
-                html.Div('📁 Drag and drop your signatures here', style={'fontWeight': 'bold', 'marginBottom': '5px'}),
-                html.Div('or click to browse files', style={'fontSize': '12px', 'color': '#666'}),
-                html.Div('(.txt format, tab-separated)', style={'fontSize': '11px', 'color': '#888', 'fontStyle': 'italic'})
-            ]),
-            style={
-                'width': '350px',
-                'height': '80px',
-                'lineHeight': '25px',
-                'borderWidth': '2px',
-                'borderStyle': 'dashed',
-                'borderRadius': '8px',
-                'textAlign': 'center',
-                'margin': '10px',
-                'backgroundColor': '#f8f9fa',
-                'borderColor': '#007bff',
-                'cursor': 'pointer'
-            },
-            multiple=False
-    ),
-    html.Div(id='upload-error-message-2'),
-    html.Div(id='info_uploader-2'),
-    dcc.Store(id='session-2-signatures', storage_type='session', data=None),
-    dcc.Location(id='url-page2', refresh=False),
-    dcc.Loading(
-        id="loading-graphs",
-        type="default",
-        children=html.Div(id='plots-container-2')
-    )
-    ], fluid=True),
-    dcc.Download(id="download-dataframe-csv-2"),
-    dcc.Download(id="download-dataframe-csv-signatures-2"),
-    dcc.Store(id='plots-page-store', data=0),    # stores the page number
-    html.Div(id='plots-navigation', className='mb-3'),  # pagination buttons
-    html.Div(id='plots-container-2')
-])
+        dbc.Alert(
+            [
+                html.H5("Expected File Format", style={"font-size": "18px", "font-weight": "bold"}),
+                html.P("The uploaded file should be a tab-separated file (.txt) containing mutation types and corresponding mutation signatures.",
+                    style={"font-size": "14px"}),
+                html.P("Columns:", style={"font-size": "14px", "margin-bottom": "5px"}),
+                html.Ul([
+                    html.Li("Type: Mutation type (e.g., A[C>A]A, A[C>A]C, ...).", style={"font-size": "13px"}),
+                    html.Li("SBS1, SBS2, ..., SBSN: Signature mutation values (frequencies or probabilities).", style={"font-size": "13px"})
+                ], style={"padding-left": "20px", "margin-bottom": "5px"}),
+                html.P("Example first few rows:", style={"font-size": "14px", "margin-bottom": "5px"}),
+                html.Pre(
+                    "Type\tSBS1\tSBS2\tSBS3\n"
+                    "A[C>A]A\t0.001\t0.002\t0.003\n"
+                    "A[C>A]C\t0.004\t0.005\t0.006",
+                    style={"white-space": "pre-wrap", "font-family": "monospace", "font-size": "12px", "background-color": "#f8f9fa", "padding": "5px"}
+                ),
+            ],
+            color="info",
+            dismissable=True,
+            style={"font-size": "14px", "padding": "10px"}
+        ),
+        dcc.Upload(
+                id='upload-data-2-signatures',
+                children=html.Div([
+                    html.Div('📁 Drag and drop your signatures here', style={'fontWeight': 'bold', 'marginBottom': '5px'}),
+                    html.Div('or click to browse files', style={'fontSize': '12px', 'color': '#666'}),
+                    html.Div('(.txt format, tab-separated)', style={'fontSize': '11px', 'color': '#888', 'fontStyle': 'italic'})
+                ]),
+                style={
+                    'width': '350px',
+                    'height': '80px',
+                    'lineHeight': '25px',
+                    'borderWidth': '2px',
+                    'borderStyle': 'dashed',
+                    'borderRadius': '8px',
+                    'textAlign': 'center',
+                    'margin': '10px',
+                    'backgroundColor': '#f8f9fa',
+                    'borderColor': '#007bff',
+                    'cursor': 'pointer'
+                },
+                multiple=False
+        ),
+        html.Div(id='upload-error-message-2'),
+        html.Div(id='info_uploader-2'),
+        dcc.Store(id='session-2-signatures', storage_type='session', data=None),
+        dcc.Location(id='url-page2', refresh=False),
+        dcc.Loading(
+            id="loading-graphs",
+            type="default",
+            children=html.Div(id='plots-container-2')
+        )
+        ], fluid=True),
+        dcc.Store(id='plots-page-store', data=0),    # stores the page number
+        # Bar plot values already sent to the browser, drawn there by assets/bar_panels.js
+        dcc.Store(id='bar-panels-2', data={'axes': bar_axes(), 'panels': {}}),
+        dcc.Store(id='bar-panel-keys-2', data=[]),
+        html.Div(id='plots-navigation', className='mb-3'),  # pagination buttons
+        html.Div(id='plots-container-2')
+    ])
+
+def plot_frames(selected_file, session, signatures=None):
+    """
+    Signature and RePrint columns plotted for signatures (all of them by default), from the session's
+    upload or the selected reference file; None when the upload has expired.
+    """
+    if session is not None:
+        df_signatures = session_upload(session)
+        if df_signatures is None:
+            return None
+        df_signatures = df_signatures if signatures is None else df_signatures[signatures]
+        return df_signatures, cached_reprint(df_signatures, 0.0001)
+
+    df_signatures = load_reference(f"data/signatures/{selected_file}")
+    signatures = list(df_signatures.columns) if signatures is None else signatures
+    # Bundled references are shown without pseudo-count, as in data/cosmic_reprints
+    df_reprint = reference_reprint(f"data/signatures/{selected_file}", 0, df_signatures)[signatures]
+    return df_signatures[signatures], df_reprint
 
 @app.callback(
     Output('plots-page-store', 'data'),
@@ -263,14 +334,17 @@ def update_page(prev_clicks, next_clicks, current_page):
 @app.callback(
     Output('plots-container-2', 'children'),
     Output('plots-navigation', 'children'),
+    Output('bar-panels-2', 'data'),
+    Output('bar-panel-keys-2', 'data'),
     [Input('initial-load', 'n_intervals'),
      Input('dropdown-2', 'value'),
      Input('reload-button', 'n_clicks'),
      Input('plots-page-store', 'data')],
     [State('signatures-dropdown-2', 'value'),
-     State('session-2-signatures', 'data')]
+     State('session-2-signatures', 'data'),
+     State('bar-panel-keys-2', 'data')]
 )
-def update_graph(init_load, selected_file, n_clicks, current_page, selected_signatures, signatures):
+def update_graph(init_load, selected_file, n_clicks, current_page, selected_signatures, signatures, held_panels):
     ctx = dash.callback_context
     if not ctx.triggered:
         trigger_id = 'initial-load'
@@ -279,16 +353,7 @@ def update_graph(init_load, selected_file, n_clicks, current_page, selected_sign
 
     if trigger_id in ['initial-load', 'reload-button', 'plots-page-store']:
         if not selected_signatures or not selected_file:
-            return [], None
-
-        if signatures is not None:
-            df_signatures = pd.DataFrame(signatures['signatures_data'])
-            df_signatures.index = df_signatures['Type']
-            df_signatures = df_signatures.drop(columns='Type')
-            df_reprint = reprint(df_signatures, epsilon=0.0001)[selected_signatures]
-        else:
-            df_signatures = pd.read_csv(f"data/signatures/{selected_file}", sep='\t', index_col=0)[selected_signatures]
-            df_reprint = pd.read_csv(f"data/cosmic_reprints/{selected_file}.reprint", sep='\t', index_col=0)[selected_signatures]
+            return [], None, dash.no_update, dash.no_update
 
         per_page = 5
         total_pages = (len(selected_signatures) + per_page - 1) // per_page
@@ -297,20 +362,39 @@ def update_graph(init_load, selected_file, n_clicks, current_page, selected_sign
         end = start + per_page
         visible_signatures = selected_signatures[start:end]
 
+        source = signatures.get('handle') if signatures is not None else selected_file
+        held = set(held_panels or [])
+        missing_signatures = [signature for signature in visible_signatures
+                              if f'{source}/signature/{signature}' not in held or f'{source}/reprint/{signature}' not in held]
+
+        # Only the panels the browser does not hold yet are computed and sent, from the visible columns alone
+        if missing_signatures:
+            frames = plot_frames(selected_file, signatures, missing_signatures)
+            if frames is None:
+                return dbc.Alert(UPLOAD_EXPIRED_MESSAGE, color="warning"), None, dash.no_update, dash.no_update
+            df_signatures, df_reprint = frames
+
+        panels = Patch()
+        new_panels = []
+        if missing_signatures:
+            original_panels = bar_panels(df_signatures, missing_signatures, yaxis_title='Frequencies')
+            reprint_panels = bar_panels(df_reprint, missing_signatures, [f'RePrint_{signature}' for signature in missing_signatures], 'Probabilites')
+            for signature, original, reprint in zip(missing_signatures, original_panels, reprint_panels):
+                for key, panel in ((f'{source}/signature/{signature}', original), (f'{source}/reprint/{signature}', reprint)):
+                    if key not in held:
+                        panels['panels'][key] = panel
+                        new_panels.append(key)
+
         plots = []
         for signature in visible_signatures:
+            original_panel = f'{source}/signature/{signature}'
+            reprint_panel = f'{source}/reprint/{signature}'
             plots.append(
                 dbc.Row([
                     dbc.Col([
                         # Original signature plot with PNG download button
                         dcc.Graph(
-                            id=f'graph-original-{signature.replace(" ", "_").replace("-", "_")}',
-                            figure=create_main_dashboard(
-                                df_signatures,
-                                signature=signature,
-                                title=f'{signature}',
-                                yaxis_title='Frequencies'
-                            ),
+                            id={'type': 'bar-graph-2', 'panel': original_panel},
                             config={
                                 'displayModeBar': True,
                                 'displaylogo': False,
@@ -330,13 +414,7 @@ def update_graph(init_load, selected_file, n_clicks, current_page, selected_sign
                     dbc.Col([
                         # RePrint plot with PNG download button
                         dcc.Graph(
-                            id=f'graph-reprint-{signature.replace(" ", "_").replace("-", "_")}',
-                            figure=create_main_dashboard(
-                                df_reprint,
-                                signature=signature,
-                                title=f'RePrint_{signature}',
-                                yaxis_title='Probabilites'
-                            ),
+                            id={'type': 'bar-graph-2', 'panel': reprint_panel},
                             config={
                                 'displayModeBar': True,
                                 'displaylogo': False,
@@ -356,15 +434,94 @@ def update_graph(init_load, selected_file, n_clicks, current_page, selected_sign
                 ])
             )
 
+        if new_panels:
+            held_update = Patch()
+            held_update.extend(new_panels)
+        else:
+            panels = held_update = dash.no_update
+
         navigation = dbc.Row([
             dbc.Col(dbc.Button("Previous", id="prev-page-btn", disabled=(current_page == 0), color="secondary"), width="auto"),
             dbc.Col(html.Span(f"Page {current_page + 1} of {total_pages}"), width="auto", style={"padding": "10px"}),
             dbc.Col(dbc.Button("Next", id="next-page-btn", disabled=(current_page >= total_pages - 1), color="secondary"), width="auto")
         ], justify="center", align="center")
 
-        return plots, navigation
+        return plots, navigation, panels, held_update
+
+    return [], None, dash.no_update, dash.no_update
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='reprint', function_name='barFigure'),
+    Output({'type': 'bar-graph-2', 'panel': MATCH}, 'figure'),
+    Input('bar-panels-2', 'data'),
+    State({'type': 'bar-graph-2', 'panel': MATCH}, 'id')
+)
 
-    return [], None
+@app.callback(
+    Output('btn-export-2', 'href'),
+    Input('dropdown-2', 'value'),
+    Input('signatures-dropdown-2', 'value'),
+    Input('session-2-signatures', 'data'),
+    Input('export-format-2', 'value'),
+    State('signatures-dropdown-2', 'options')
+)
+def update_export_link(selected_file, selected_signatures, signatures, export_format, options):
+    query = [('format', export_format)] + selection_query(selected_file, signatures, selected_signatures, options)
+    return '/export/plots?' + urlencode(query)
+
+@app.callback(
+    Output("btn_csv-2", "href"),
+    Output("btn_csv-signatures-2", "href"),
+    Input('download-format-2', 'value'),
+    Input('signatures-dropdown-2', 'value'),
+    Input('dropdown-2', 'value'),
+    Input('epsilon-2', 'value'),
+    Input('session-2-signatures', 'data'),
+    State('signatures-dropdown-2', 'options')
+)
+def update_download_links_2(download_format, selected_signatures, selected_file, epsilon, contents, options):
+    return (download_link('reprint', download_format, selected_file, contents, selected_signatures, options, epsilon),
+            download_link('signatures', download_format, selected_file, contents, selected_signatures, options))
+
+@app.server.route('/export/plots')
+def export_plots():
+    """
+    ZIP of the signature and RePrint plots of the /page1 charts rendered to PNG, SVG or PDF,
+    streamed while the figure processes render them.
+    """
+    args = flask.request.args
+    export_format = args.get('format', 'png')
+    handle = args.get('handle')
+    selected_file = args.get('file')
+    if export_format not in EXPORT_FORMATS or (handle is None and selected_file not in FILES):
+        flask.abort(400)
+    if not export_available():
+        return 'Static image export needs kaleido and a Chrome it can use (see README).', 501
+
+    try:
+        frames = plot_frames(selected_file, {'handle': handle} if handle is not None else None, query_signatures(args))
+    except KeyError:
+        flask.abort(400)
+    if frames is None:
+        return UPLOAD_EXPIRED_MESSAGE, 404
+
+    df_signatures, df_reprint = frames
+    selected_signatures = list(df_signatures.columns)
+    original_figures = create_main_dashboards(df_signatures, selected_signatures, yaxis_title='Frequencies')
+    reprint_figures = create_main_dashboards(df_reprint, selected_signatures, [f'RePrint_{signature}' for signature in selected_signatures], 'Probabilites')
+    figures = []
+    for signature, original, reprint in zip(selected_signatures, original_figures, reprint_figures):
+        figures += [(f'{signature}_plot', original), (f'Reprint_{signature}_plot', reprint)]
+
+    archive = export_images(figures, export_format)
+    try:
+        # Rendering problems surface here instead of as a broken download
+        first = next(archive)
+    except Exception as e:
+        return f'Image export failed: {e}', 500
+    return flask.Response(itertools.chain([first], archive), mimetype='application/zip',
+                          headers={'Content-Disposition': f'attachment; filename=reprint_plots_{export_format}.zip'})
 
 @app.callback(
     Output('session-2-signatures', 'data'),
@@ -377,7 +534,7 @@ def update_session_2_data(contents, filename):
         try:
             df_signatures = parse_signatures(contents, filename)
             return {
-                'signatures_data': df_signatures.to_dict('records'),
+                'handle': save_upload(df_signatures.set_index('Type')),
                 'filename': filename,
                 'info': "Signatures uploaded successfully"
             }
@@ -411,10 +568,8 @@ def show_upload_status(contents, filename):
      Input('session-2-signatures', 'data')]
 )
 def set_options(selected_category, contents):
-    if contents is not None:
-        df = pd.DataFrame(contents['signatures_data'])
-        df.index = df['Type']
-        df = df.drop(columns='Type')
+    df = session_upload(contents)
+    if df is not None:
         signatures = df.columns.to_list()
         return (
             [{'label': signature, 'value': signature} for signature in signatures],
@@ -425,34 +580,7 @@ def set_options(selected_category, contents):
     return ([{'label': f"{i}", 'value': i} for i in data[selected_category]],
             [i for i in data[selected_category]],
             {'display': 'block'},
-            'Not Uploaded')
-
-@app.callback(
-    Output("download-dataframe-csv-2", "data"),
-    Input("btn_csv-2", "n_clicks"),
-    [State('signatures-dropdown-2', 'value'),
-     State('dropdown-2', 'value'),
-     State('epsilon-2', 'value'),
-     State('session-2-signatures', 'data')],
-    prevent_initial_call=True
-)
-def download_dataframe(n_clicks, selected_signatures, selected_file, epsilon, contents):
-    if contents is not None:
-        df_signatures = pd.DataFrame(contents['signatures_data'])
-        df_signatures.index = df_signatures['Type']
-        df_signatures = df_signatures.drop(columns='Type')[selected_signatures]
-        df_reprint = reprint(df_signatures, epsilon=epsilon)
-
-        df_reprint.columns = [f"reprint_{col}" for col in df_reprint.columns]
-
-        return dcc.send_data_frame(df_reprint.to_csv, filename="reprints.csv")
-    else:
-        df_signatures = pd.read_csv(f"data/signatures/{selected_file}", sep='\t', index_col=0)[selected_signatures]
-        df_reprint = reprint(df_signatures, epsilon=epsilon)
-
-        df_reprint.columns = [f"reprint_{col}" for col in df_reprint.columns]
-
-        return dcc.send_data_frame(df_reprint.to_csv, filename="reprints.csv")
+            'Not Uploaded' if contents is None else UPLOAD_EXPIRED_MESSAGE)
 
 @app.callback(
     Output("collapse-form-2", "is_open"),
@@ -464,26 +592,6 @@ def toggle_collapse(n, is_open):
         return not is_open
     return is_open
 
-@app.callback(
-    Output("download-dataframe-csv-signatures-2", "data"),
-    Input("btn_csv-signatures-2", "n_clicks"),
-    [
-        State('signatures-dropdown-2', 'value'),
-        State('dropdown-2', 'value'),
-        State('session-2-signatures', 'data')
-    ],
-    prevent_initial_call=True
-)
-def download_signatures_only_2(n_clicks, selected_signatures, selected_file, contents):
-    if contents is not None:
-        df_signatures = pd.DataFrame(contents['signatures_data'])
-        df_signatures.index = df_signatures['Type']
-        df_signatures = df_signatures.drop(columns='Type')[selected_signatures]
-    else:
-        df_signatures = pd.read_csv(f"data/signatures/{selected_file}", sep='\t', index_col=0)[selected_signatures]
-
-    return dcc.send_data_frame(df_signatures.to_csv, filename="signatures.csv")
-
 @app.callback(
     Output("reload-button", "color"),
     Output("tooltip-button-2", "style"),
@@ -1,6 +1,7 @@
 from utils.utils import data
 from utils.figpanel import create_empty_figure_with_text, create_main_dashboard
 from utils.uploader import parse_contents, load_signatures
+from utils.references import signature_names
 from dash import dcc, html
 from main import app
 import numpy as np
@@ -19,7 +20,7 @@ organs = [
     "Myeloid", "Oral_Oropharyngeal", "Esophagus", "Head_neck"
 ]
 data = {
-    f'{organ}_Signature.csv': pd.read_csv(f'data/signatures_organ/latest/{organ}_Signature.csv', sep=',').columns[1:].to_list() for organ in organs
+    f'{organ}_Signature.csv': signature_names(f'data/signatures_organ/latest/{organ}_Signature.csv') for organ in organs
 }
 #@todo change version for signatures latest/version_1/version_2
 # Application layout
@@ -0,0 +1,209 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import cophenet, linkage
+from scipy.spatial.distance import squareform
+
+from utils.cache import cached_array, content_hash, make_key, results
+from utils.utils import reprint_terms, reprint_sweep, distance_matrix, cross_distance_matrix, linkage_methods
+
+# Build the linkage of every other clustering method in the job of a view once its figures are drawn;
+# off by default, as the view's response then waits for those linkages
+PRECOMPUTE_LINKAGES = bool(int(os.environ.get('REPRINT_PRECOMPUTE_LINKAGES', 0)))
+
+
+def cached_reprint_terms(data, data_hash=None):
+    """
+    reprint_terms of data memoised on its content, shared by every epsilon.
+    """
+    data_hash = content_hash(data) if data_hash is None else data_hash
+    return results.get_or_compute(make_key('reprint-terms', data_hash), lambda: reprint_terms(data))
+
+
+def cached_reprint_sweep(data, epsilons):
+    """
+    RePrint of data at every epsilon, as an (n_epsilons, n_types, n_signatures) array.
+    """
+    return reprint_sweep(data, epsilons, cached_reprint_terms(data))
+
+
+def cached_reprint(data, epsilon):
+    """
+    RePrint of data memoised on its content and epsilon; a new epsilon only redoes the final division.
+    """
+    data_hash = content_hash(data)
+
+    def compute():
+        values = reprint_sweep(data, [float(epsilon)], cached_reprint_terms(data, data_hash))[0]
+        return pd.DataFrame(values, index=data.index.rename(None), columns=data.columns)
+
+    return results.get_or_compute(make_key('reprint', data_hash, float(epsilon)), compute).copy(deep=False)
+
+
+def row_labels(df):
+    """
+    Hash of every row's name and values, identifying the row in any selection it appears in.
+    """
+    values = np.ascontiguousarray(df.to_numpy(dtype=np.float64))
+    return [hashlib.sha1(repr(name).encode('utf-8') + row.tobytes()).hexdigest() for name, row in zip(df.index, values)]
+
+
+def _labels_digest(labels):
+    return hashlib.sha1(''.join(labels).encode('ascii')).hexdigest()
+
+
+def _shared_union(scope, calc_func):
+    """
+    Union of a scope rebuilt from the blocks of rows other worker processes added to the shared cache.
+    Every block holds the distances of its rows to all rows before them, so it is only used
+    after the blocks it was computed against.
+    """
+    labels, values, rows = [], [], []
+    while True:
+        block = results.get_shared(make_key('distance-union-block', scope, calc_func, len(rows)))
+        if block is None or block['prior'] != _labels_digest(labels):
+            break
+        labels += block['labels']
+        values.append(block['values'])
+        rows.append(block['distances'])
+    if not rows:
+        return None
+
+    n = len(labels)
+    matrix = np.zeros((n, n))
+    start = 0
+    for block_rows in rows:
+        stop = start + len(block_rows)
+        matrix[start:stop, :stop] = block_rows
+        matrix[:stop, start:stop] = block_rows.T
+        start = stop
+    return {'labels': labels, 'values': np.vstack(values), 'matrix': matrix, 'blocks': len(rows)}
+
+
+def selection_distance_matrix(df, calc_func, scope):
+    """
+    Distance matrix of a selection of rows from a larger frame identified by scope.
+    Every row seen for the scope is kept with its distances to the others in a shared matrix,
+    so changing the selection only computes the rows it adds.
+    """
+    key = make_key('distance-union', scope, calc_func)
+    union = results.get(key)
+    if union is None:
+        union = (_shared_union(scope, calc_func)
+                 or {'labels': [], 'values': np.empty((0, df.shape[1])), 'matrix': np.empty((0, 0)), 'blocks': 0})
+        results.set(key, union, shared=False)
+
+    labels = row_labels(df)
+    known = {label: i for i, label in enumerate(union['labels'])}
+    new_rows = []
+    for i, label in enumerate(labels):
+        if label not in known:
+            known[label] = None
+            new_rows.append(i)
+
+    if new_rows:
+        old_values = pd.DataFrame(union['values'], columns=df.columns)
+        new_values = df.iloc[new_rows]
+        n_old, n_new = len(old_values), len(new_rows)
+
+        matrix = np.empty((n_old + n_new, n_old + n_new))
+        matrix[:n_old, :n_old] = union['matrix']
+        cross = cross_distance_matrix(new_values, old_values, calc_func)
+        matrix[n_old:, :n_old] = cross
+        matrix[:n_old, n_old:] = cross.T
+        matrix[n_old:, n_old:] = distance_matrix(new_values, calc_func)
+
+        # Only the added rows go to the shared cache; the whole union stays in this process
+        block = {
+            'prior': _labels_digest(union['labels']),
+            'labels': [labels[i] for i in new_rows],
+            'values': new_values.to_numpy(dtype=np.float64),
+            'distances': matrix[n_old:],
+        }
+        results.set_shared(make_key('distance-union-block', scope, calc_func, union['blocks']), block)
+        union = {
+            'labels': union['labels'] + block['labels'],
+            'values': np.vstack([union['values'], block['values']]),
+            'matrix': matrix,
+            'blocks': union['blocks'] + 1,
+        }
+        results.set(key, union, shared=False)
+        known = {label: i for i, label in enumerate(union['labels'])}
+
+    positions = [known[label] for label in labels]
+    return union['matrix'][np.ix_(positions, positions)]
+
+
+def cached_distance_matrix(df, calc_func, df_hash=None, scope=None):
+    """
+    Square distance matrix between the rows of df, memoised on its content and the metric.
+    With a scope (the hash of the frame the rows were selected from) it is built incrementally.
+    """
+    df_hash = content_hash(df) if df_hash is None else df_hash
+    if scope is None:
+        return cached_array('distance', (df_hash, calc_func), lambda: distance_matrix(df, calc_func))
+    return cached_array('distance', (df_hash, calc_func), lambda: selection_distance_matrix(df, calc_func, scope))
+
+
+def cached_condensed_distance(df, calc_func, df_hash=None, scope=None):
+    """
+    Condensed distance vector of the rows of df: the only input of linkage, shared by every clustering method.
+    """
+    df_hash = content_hash(df) if df_hash is None else df_hash
+    return cached_array('condensed-distance', (df_hash, calc_func),
+                        lambda: squareform(cached_distance_matrix(df, calc_func, df_hash, scope)))
+
+
+def cached_linkage(df, calc_func, method, df_hash=None, scope=None):
+    """
+    Linkage matrix of the rows of df, memoised on its content, the metric and the clustering method.
+    Switching the method only reruns linkage on the cached condensed distances.
+    """
+    df_hash = content_hash(df) if df_hash is None else df_hash
+    return cached_array('linkage', (df_hash, calc_func, method),
+                        lambda: linkage(cached_condensed_distance(df, calc_func, df_hash, scope), method=method))
+
+
+def precompute_linkages(df, calc_func, methods=linkage_methods, df_hash=None, scope=None):
+    """
+    Computes the linkage of every method not cached yet from the cached condensed distances and returns
+    those methods. The results land in the shared cache, where a later switch of method finds them.
+    """
+    if not PRECOMPUTE_LINKAGES or len(df) < 2:
+        return []
+    df_hash = content_hash(df) if df_hash is None else df_hash
+    condensed = cached_condensed_distance(df, calc_func, df_hash, scope)
+    missing = [method for method in methods if results.get(make_key('linkage', df_hash, calc_func, method)) is None]
+    for method in missing:
+        cached_array('linkage', (df_hash, calc_func, method), lambda: linkage(condensed, method=method))
+    return missing
+
+
+def epsilon_sensitivity(data, epsilons, epsilon, calc_func, method):
+    """
+    How the RePrint distances and clustering of the signatures (columns) of data move across a sweep of epsilons,
+    compared with the chosen epsilon. One row per epsilon with the relative change of the distance matrix
+    and the correlation of its cophenetic distances with those of the chosen clustering.
+    """
+    epsilons = np.union1d(np.asarray(epsilons, dtype=np.float64), [float(epsilon)])
+    sweep = cached_reprint_sweep(data, epsilons)
+
+    matrices = [distance_matrix(pd.DataFrame(values.T), calc_func) for values in sweep]
+    reference = matrices[int(np.flatnonzero(epsilons == float(epsilon))[0])]
+    reference_norm = np.linalg.norm(reference)
+
+    rows = []
+    reference_cophenetic = None
+    if len(reference) > 2:
+        reference_cophenetic = cophenet(linkage(squareform(reference, checks=False), method=method))
+    for eps, matrix in zip(epsilons, matrices):
+        change = np.linalg.norm(matrix - reference) / reference_norm if reference_norm else 0.0
+        correlation = np.nan
+        if reference_cophenetic is not None:
+            cophenetic = cophenet(linkage(squareform(matrix, checks=False), method=method))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                correlation = np.corrcoef(cophenetic, reference_cophenetic)[0, 1]
+        rows.append({'epsilon': eps, 'distance_change': change, 'cophenetic_correlation': correlation})
+    return pd.DataFrame(rows)
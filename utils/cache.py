@@ -0,0 +1,282 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.io as pio
+import scipy
+
+from utils.paths import private_dir
+
+# Upper bound on the memory held by cached results in each worker process
+MAX_CACHE_BYTES = int(os.environ.get('REPRINT_CACHE_BYTES', 32 * 2 ** 20))
+
+# Results shared by all gunicorn workers on a node, in a directory private to the app's user;
+# an empty REPRINT_CACHE_DIR disables the shared tier
+CACHE_DIR = os.environ.get('REPRINT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'reprint-cache'))
+MAX_DISK_CACHE_BYTES = int(os.environ.get('REPRINT_DISK_CACHE_BYTES', 1024 * 2 ** 20))
+
+# Bump when a cached result or figure builder changes; the shared tier outlives restarts and deploys.
+# Keys also depend on the libraries that produce and pickle the values, so an upgrade starts a fresh cache
+CACHE_VERSION = 1
+CACHE_TAG = hashlib.sha1(repr((CACHE_VERSION, np.__version__, pd.__version__, scipy.__version__,
+                               plotly.__version__)).encode('utf-8')).hexdigest()[:12]
+
+# Processes of a web worker's pool rendering the chunks of an image export side by side
+FIGURE_PROCESSES = int(os.environ.get('REPRINT_FIGURE_PROCESSES', min(2, os.cpu_count() or 1)))
+
+# Threads building the two panels of one view side by side inside its background job: the NumPy distance
+# kernels of one panel release the GIL and overlap the other's work, plotly figure construction does not
+PANEL_THREADS = int(os.environ.get('REPRINT_PANEL_THREADS', min(2, os.cpu_count() or 1)))
+
+
+def result_size(value):
+    """
+    Approximate memory footprint of a cached value in bytes.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (tuple, list)):
+        return sum(result_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(result_size(item) for item in value.values())
+    return 64
+
+
+class DiskCache:
+    """
+    SQLite-backed LRU shared by every worker process on a node. Values are pickled,
+    each write is a single transaction, and the least recently used entries are
+    deleted once the stored size exceeds max_bytes.
+    """
+
+    def __init__(self, path, max_bytes=MAX_DISK_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread and process; connections must not cross a fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            private_dir(os.path.dirname(self.path))
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS entries '
+                               '(key TEXT PRIMARY KEY, value BLOB, size INTEGER, accessed REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key, default=None):
+        connection = self._connection()
+        row = connection.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return default
+        try:
+            value = pickle.loads(row[0])
+        except Exception:
+            # Written by code that no longer unpickles the same way: a miss, and the row goes
+            connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            return default
+        connection.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+        return value
+
+    def set(self, key, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)',
+                               (key, sqlite3.Binary(blob), len(blob), time.time()))
+            total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            if total > self.max_bytes:
+                # Oldest entries first until the rest fits
+                connection.execute(
+                    'DELETE FROM entries WHERE key IN ('
+                    ' SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY accessed DESC) AS kept FROM entries)'
+                    ' WHERE kept > ?)', (self.max_bytes,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM entries')
+
+
+class ResultCache:
+    """
+    Thread-safe LRU of computed results, evicting the least recently used entries
+    once their total size exceeds max_bytes. With a shared backend, results missing
+    in this process are looked up there and every new result is written through.
+    """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, backend=None):
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                self._remember(key, value)
+                return value
+        return default
+
+    def set(self, key, value, shared=True):
+        self._remember(key, value)
+        if shared and self.backend is not None:
+            self.backend.set(key, value)
+
+    def get_shared(self, key):
+        """
+        Value of the shared tier only, without keeping it in this process.
+        """
+        return None if self.backend is None else self.backend.get(key)
+
+    def set_shared(self, key, value):
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def _remember(self, key, value):
+        size = result_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+results = ResultCache(backend=DiskCache(os.path.join(CACHE_DIR, 'results.sqlite')) if CACHE_DIR else None)
+
+_executors = {}
+_panel_executors = {}
+
+
+def content_hash(df):
+    """
+    Hash of a frame's values and labels, used to recognise the same input matrix across requests.
+    """
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(df.to_numpy(dtype=np.float64)).tobytes())
+    h.update(json.dumps([list(map(str, df.index)), list(map(str, df.columns))]).encode('utf-8'))
+    return h.hexdigest()
+
+
+def make_key(kind, *parts):
+    """
+    Cache key of a result kind computed from the given parts (hashes, parameters, function names).
+    """
+    parts = [CACHE_TAG] + [part.__name__ if callable(part) else part for part in parts]
+    return f'{kind}:' + hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def _read_only(value):
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    return value
+
+
+def cached_array(kind, parts, compute):
+    """
+    Memoised NumPy result (distance matrix, linkage); the cached array is read-only.
+    """
+    return _read_only(results.get_or_compute(make_key(kind, *parts), compute))
+
+
+def cached_figure_json(builder, df, **kwargs):
+    """
+    Figure built by builder(df, **kwargs) serialized to JSON, memoised on the content of df and the parameters.
+    """
+    params = [(name, value.__name__ if callable(value) else value) for name, value in sorted(kwargs.items())]
+    key = make_key(builder.__name__, content_hash(df), params)
+    return results.get_or_compute(key, lambda: pio.to_json(builder(df, **kwargs), validate=False))
+
+
+def cached_figure(builder, df, **kwargs):
+    """
+    Figure dict of cached_figure_json.
+    """
+    return json.loads(cached_figure_json(builder, df, **kwargs))
+
+
+def figure_executor():
+    """
+    Figure process pool of the current process. Workers start from a fork server (spawned where there is none),
+    never from a fork of a threaded web worker; a pool does not survive the fork into a job process.
+    """
+    pid = os.getpid()
+    if pid not in _executors:
+        _executors.clear()
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        _executors[pid] = ProcessPoolExecutor(FIGURE_PROCESSES, mp_context=context)
+    return _executors[pid]
+
+
+def panel_executor():
+    """
+    Panel thread pool of the current process; like the figure pool it does not survive a fork into a job process.
+    """
+    pid = os.getpid()
+    if pid not in _panel_executors:
+        _panel_executors.clear()
+        _panel_executors[pid] = ThreadPoolExecutor(PANEL_THREADS, thread_name_prefix='panel')
+    return _panel_executors[pid]
+
+
+def submit_figure(builder, df, **kwargs):
+    """
+    Starts cached_figure(builder, df, **kwargs) on the panel thread pool and returns its future,
+    so the panels of one view are built concurrently within the job slot of their view.
+    """
+    if PANEL_THREADS < 2:
+        # A single core gains nothing from a second thread: build it right away
+        future = Future()
+        future.set_result(cached_figure(builder, df, **kwargs))
+        return future
+    return panel_executor().submit(cached_figure, builder, df, **kwargs)
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+# Canonical SBS-96 layout, built once at import
+MUTATIONS = ['C>A', 'C>G', 'C>T', 'T>A', 'T>C', 'T>G']
+BASES = ['A', 'C', 'G', 'T']
+CONTEXTS = [f'{x}[{m}]{y}' for m in MUTATIONS for x in BASES for y in BASES]
+CONTEXT_INDEX = pd.Index(CONTEXTS)
+
+# Positions of the 16 contexts of every mutation class in canonical order
+MUTATION_BLOCKS = {mutation: np.arange(16 * i, 16 * (i + 1)) for i, mutation in enumerate(MUTATIONS)}
+
+# RePrint denominator sets NL[X>.]NR: group code of every context
+_group_keys = [(context[0], context[2], context[6]) for context in CONTEXTS]
+_group_ids = {key: i for i, key in enumerate(dict.fromkeys(_group_keys))}
+GROUP_CODES = np.array([_group_ids[key] for key in _group_keys], dtype=np.intp)
+N_GROUPS = len(_group_ids)
+
+for _array in (GROUP_CODES, *MUTATION_BLOCKS.values()):
+    _array.flags.writeable = False
+
+
+def context_positions(types):
+    """
+    Maps mutation types to their canonical positions (-1 for types outside the SBS-96 layout).
+    """
+    return CONTEXT_INDEX.get_indexer(pd.Index(types))
+
+
+def is_known(positions):
+    """
+    True when every position is a canonical context and none repeats.
+    """
+    return bool((positions >= 0).all()) and len(np.unique(positions)) == len(positions)
+
+
+def join_on_contexts(left, right):
+    """
+    Inner join of two Type-indexed frames, done on canonical positions when both use the SBS-96 layout.
+    """
+    left_positions = context_positions(left.index)
+    right_positions = context_positions(right.index)
+    if not (is_known(left_positions) and is_known(right_positions)):
+        return left.join(right, how='inner')
+
+    # Row of right for every canonical position, -1 where right lacks the context
+    right_rows = np.full(len(CONTEXTS), -1, dtype=np.intp)
+    right_rows[right_positions] = np.arange(len(right_positions))
+    matched = right_rows[left_positions]
+    keep = matched >= 0
+
+    left_part = left.iloc[np.flatnonzero(keep)]
+    right_part = right.iloc[matched[keep]]
+    right_part.index = left_part.index
+    return pd.concat([left_part, right_part], axis=1)
+
+
+def canonical_matrix(df, fill_value=0):
+    """
+    Columns of a Type-indexed frame laid out in canonical order as a (96, n_columns) array, fill_value where a context is missing.
+    """
+    positions = context_positions(df.index)
+    known = positions >= 0
+    values = np.full((len(CONTEXTS), df.shape[1]), fill_value, dtype=np.float64)
+    values[positions[known]] = df.to_numpy(dtype=np.float64)[known]
+    return values
+
+
+def canonical_values(series, fill_value=0):
+    """
+    Values of a Type-indexed series laid out in canonical order, fill_value where a context is missing.
+    """
+    return canonical_matrix(series.to_frame(), fill_value)[:, 0]
@@ -0,0 +1,72 @@
+import os
+import zlib
+
+from utils.export import StreamBuffer
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet downloads need pyarrow; CSV works without it
+    pa = pq = None
+
+# Content type and file extension of every download format
+DOWNLOAD_FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'csv.gz': ('application/gzip', '.csv.gz'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+}
+
+# Matrix cells formatted per piece of a streamed download
+CHUNK_CELLS = int(os.environ.get('REPRINT_DOWNLOAD_CHUNK_CELLS', 2 ** 16))
+
+
+def _row_chunks(df):
+    rows = max(1, CHUNK_CELLS // max(1, df.shape[1]))
+    for start in range(0, len(df), rows):
+        yield df.iloc[start:start + rows]
+
+
+def csv_chunks(df):
+    """
+    df.to_csv() encoded piece by piece, a few rows at a time.
+    """
+    yield df.iloc[:0].to_csv().encode('utf-8')
+    for chunk in _row_chunks(df):
+        yield chunk.to_csv(header=False).encode('utf-8')
+
+
+def gzip_chunks(chunks):
+    """
+    Gzip stream of a sequence of byte strings.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def parquet_chunks(df):
+    """
+    Parquet file of df with its index as the first column (Type when unnamed), one row group per piece.
+    """
+    df = df.rename_axis(df.index.name or 'Type')
+    schema = pa.Table.from_pandas(df.iloc[:0].reset_index(), preserve_index=False).schema
+    stream = StreamBuffer()
+    with pq.ParquetWriter(stream, schema) as writer:
+        for chunk in _row_chunks(df):
+            writer.write_table(pa.Table.from_pandas(chunk.reset_index(), schema=schema, preserve_index=False))
+            yield stream.drain()
+    yield stream.drain()
+
+
+def matrix_chunks(df, fmt):
+    """
+    Download of df in one of DOWNLOAD_FORMATS as a sequence of byte strings.
+    """
+    if fmt == 'parquet':
+        return parquet_chunks(df)
+    if fmt == 'csv.gz':
+        return gzip_chunks(csv_chunks(df))
+    return csv_chunks(df)
@@ -0,0 +1,163 @@
+import functools
+import glob
+import os
+import tempfile
+import zipfile
+from collections import deque
+
+import plotly.io as pio
+
+from utils.cache import FIGURE_PROCESSES, figure_executor
+from utils.jobs import job_slot
+
+try:
+    import kaleido
+except ImportError:  # static export needs kaleido and a Chrome it can drive (plotly_get_chrome)
+    kaleido = None
+
+# Formats of the bulk plot export and how they are stored in the ZIP (raster and PDF are already compressed)
+EXPORT_FORMATS = {'png': zipfile.ZIP_STORED, 'svg': zipfile.ZIP_DEFLATED, 'pdf': zipfile.ZIP_STORED}
+
+# Image size of the toImage button on the /page1 charts
+EXPORT_WIDTH = 800
+EXPORT_HEIGHT = 600
+EXPORT_SCALE = 2
+
+# Figures rendered by one kaleido browser session
+EXPORT_CHUNK = int(os.environ.get('REPRINT_EXPORT_CHUNK', 24))
+
+# Chrome downloaded by install_chrome at build time, inside the app directory so it ships with the app
+CHROME_DIR = os.environ.get('REPRINT_CHROME_DIR', '.chrome')
+CHROME_EXECUTABLES = ['chrome-*/chrome', 'chrome-*/chrome.exe', 'chrome-*/*.app/Contents/MacOS/*']
+
+
+def bundled_chrome(chrome_dir=CHROME_DIR):
+    """
+    Executable of the Chrome install_chrome put in chrome_dir, or None.
+    """
+    for pattern in CHROME_EXECUTABLES:
+        matches = sorted(glob.glob(os.path.join(chrome_dir, pattern)))
+        if matches:
+            return os.path.abspath(matches[0])
+    return None
+
+
+# kaleido looks for its Chrome on PATH unless BROWSER_PATH names one; set on import, so pool workers see it too
+_chrome = bundled_chrome()
+if _chrome is not None:
+    os.environ.setdefault('BROWSER_PATH', _chrome)
+
+
+@functools.lru_cache(maxsize=None)
+def export_available():
+    """
+    True when kaleido can render here, checked once per process with a tiny figure (it needs a Chrome to drive).
+    """
+    if kaleido is None:
+        return False
+    try:
+        pio.to_image({'data': [{'type': 'bar', 'y': [1]}]}, format='svg', validate=False)
+    except Exception:
+        return False
+    return True
+
+
+def install_chrome(chrome_dir=CHROME_DIR):
+    """
+    Downloads the Chrome kaleido renders with to chrome_dir when none is usable yet;
+    run at build time (see bin/post_compile), never on the boot path of a web process.
+    """
+    if kaleido is None or export_available():
+        return
+    try:
+        os.environ.setdefault('BROWSER_PATH', os.path.abspath(kaleido.get_chrome_sync(path=chrome_dir)))
+    except Exception as e:
+        # The app runs without it; the export controls stay hidden
+        print(f'Could not install Chrome for image export: {e}')
+    export_available.cache_clear()
+
+
+def render_images(figures, fmt):
+    """
+    Renders figure dicts to fmt in one kaleido session and returns the bytes of every image.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, f'{i}.{fmt}') for i in range(len(figures))]
+        pio.write_images(figures, paths, format=fmt, width=EXPORT_WIDTH, height=EXPORT_HEIGHT,
+                         scale=EXPORT_SCALE, validate=False)
+        images = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                images.append(f.read())
+    return images
+
+
+def _render_in_slot(figures, fmt):
+    # Rendering is as heavy as an analysis job and queues for the same node-wide slots
+    with job_slot():
+        return render_images(figures, fmt)
+
+
+def _rendered_chunks(chunks, fmt):
+    """
+    Images of every chunk in order, rendered on the figure process pool with a few chunks in flight.
+    """
+    if FIGURE_PROCESSES < 2:
+        for chunk in chunks:
+            yield _render_in_slot(chunk, fmt)
+        return
+
+    executor = figure_executor()
+    pending = deque()
+    try:
+        for chunk in chunks:
+            pending.append(executor.submit(_render_in_slot, chunk, fmt))
+            if len(pending) > FIGURE_PROCESSES:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # The client went away: drop the chunks nobody will read
+        for future in pending:
+            future.cancel()
+
+
+class StreamBuffer:
+    """
+    Write-only file collecting what a writer (zipfile, a Parquet writer) produces until it is handed to the response.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def export_images(figures, fmt):
+    """
+    ZIP archive of (name, figure dict) pairs rendered to fmt, yielded piece by piece as each chunk finishes.
+    """
+    names = [name for name, _ in figures]
+    chunks = [[figure for _, figure in figures[i:i + EXPORT_CHUNK]] for i in range(0, len(figures), EXPORT_CHUNK)]
+
+    stream = StreamBuffer()
+    with zipfile.ZipFile(stream, 'w', EXPORT_FORMATS[fmt]) as archive:
+        position = 0
+        for images in _rendered_chunks(chunks, fmt):
+            for image in images:
+                archive.writestr(f'{names[position]}.{fmt}', image)
+                position += 1
+            yield stream.drain()
+    yield stream.drain()
@@ -1,37 +1,163 @@
-import plotly.figure_factory as ff
-from scipy.spatial.distance import squareform
+import base64
+import copy
+import functools
+import json
+import os
 import plotly.graph_objects as go
-from utils.utils import calculate_rmse
-from scipy.cluster.hierarchy import linkage
+import plotly.io as pio
+from scipy.cluster.hierarchy import dendrogram, leaves_list
+from utils.utils import calculate_rmse, cross_distance_matrix, linkage_methods
+from utils.analysis import cached_distance_matrix, cached_linkage, epsilon_sensitivity, precompute_linkages
+from utils.cache import content_hash
+from utils.contexts import MUTATIONS, CONTEXTS, MUTATION_BLOCKS, canonical_matrix, canonical_values
 import numpy as np
 
+# Pseudo-counts compared by the epsilon sensitivity view (the chosen epsilon is added to them)
+EPSILON_SWEEP = np.logspace(-8, -2, 13)
+
+# Heatmaps of more signatures than this are sent block-averaged as float32, with a short hover
+LARGE_HEATMAP = int(os.environ.get('REPRINT_LARGE_HEATMAP', 200))
+# Cells per side of a large heatmap; zooming in replaces the blocks with the cells of the visible area
+HEATMAP_MAX_SIDE = int(os.environ.get('REPRINT_HEATMAP_MAX_SIDE', 150))
+
+# Bar colour of every mutation class in the signature profiles
+BAR_COLORS = {
+    'C>A': 'blue',
+    'C>G': 'black',
+    'C>T': 'red',
+    'T>A': 'gray',
+    'T>C': 'green',
+    'T>G': 'pink'
+}
+
+# Link colours of scipy's cluster colour codes, as plotly's figure_factory dendrogram draws them
+DENDROGRAM_COLORS = {
+    'C0': 'rgb(0,116,217)',
+    'C1': 'rgb(61,153,112)',
+    'C2': 'rgb(255,65,54)',
+    'C3': 'rgb(35,205,205)',
+    'C4': 'rgb(133,20,75)',
+    'C5': 'rgb(255,220,0)',
+    'C6': 'rgb(40,35,35)',
+    'C7': 'rgb(61,153,112)',
+    'C8': 'rgb(255,65,54)',
+    'C9': 'rgb(35,205,205)',
+}
+
+DENDROGRAM_AXIS = {
+    'type': 'linear',
+    'ticks': 'outside',
+    'mirror': 'allticks',
+    'rangemode': 'tozero',
+    'showticklabels': True,
+    'zeroline': False,
+    'showgrid': False,
+    'showline': True,
+}
+
+
+def leaf_positions(n_leaves):
+    """
+    Axis positions of the leaves of a scipy dendrogram, in leaf order.
+    """
+    return [5.0 + 10.0 * i for i in range(n_leaves)]
+
+
+def dendrogram_traces(tree, orientation, xaxis='x', yaxis='y', merge=False):
+    """
+    Link traces of a scipy dendrogram (computed with no_plot=True) growing from the leaves
+    towards 'bottom', 'left' or 'right'. With merge, the links of each colour form one trace.
+    """
+    icoord = np.array(tree['icoord'])
+    dcoord = np.array(tree['dcoord'])
+    if orientation == 'bottom':
+        xs, ys = icoord, dcoord
+    elif orientation == 'right':
+        xs, ys = np.multiply(-1, dcoord), icoord
+    else:
+        xs, ys = dcoord, np.multiply(-1, icoord)
+
+    if merge:
+        # NaN breaks the line between consecutive links
+        traces = []
+        colors = np.array(tree['color_list'])
+        for color in dict.fromkeys(tree['color_list']):
+            links = colors == color
+            gaps = np.full((links.sum(), 1), np.nan)
+            traces.append(go.Scatter(x=np.hstack([xs[links], gaps]).ravel(), y=np.hstack([ys[links], gaps]).ravel(),
+                                     mode='lines', marker=dict(color=DENDROGRAM_COLORS[color]), hoverinfo='skip',
+                                     xaxis=xaxis, yaxis=yaxis))
+        return traces
+
+    return [go.Scatter(x=x, y=y, mode='lines', marker=dict(color=DENDROGRAM_COLORS[color]), hoverinfo='text',
+                       xaxis=xaxis, yaxis=yaxis)
+            for x, y, color in zip(xs, ys, tree['color_list'])]
+
+
+def typed_array(values, dtype=np.float32):
+    """
+    plotly.js typed array of values: base64 of the raw buffer instead of a JSON list of numbers.
+    """
+    values = np.ascontiguousarray(values, dtype=dtype)
+    spec = {'dtype': values.dtype.str[1:], 'bdata': base64.b64encode(values).decode('ascii')}
+    if values.ndim > 1:
+        spec['shape'] = ', '.join(map(str, values.shape))
+    return spec
+
+
+def block_heatmap(matrix, positions, rows=slice(None), cols=slice(None), max_side=HEATMAP_MAX_SIDE):
+    """
+    Area rows x cols of a leaf-ordered distance matrix, averaged over blocks of neighbouring leaves
+    so that neither side exceeds max_side cells. Returns the x and y positions of the blocks
+    and their values rounded to 4 decimals as float32.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+
+    def blocks(index):
+        index = np.arange(len(positions))[index]
+        size = -(-len(index) // max_side)
+        starts = np.arange(0, len(index), size)
+        counts = np.diff(np.append(starts, len(index)))
+        return index, starts, counts, np.add.reduceat(positions[index], starts) / counts
+
+    row_index, row_starts, row_counts, y = blocks(rows)
+    col_index, col_starts, col_counts, x = blocks(cols)
+    area = matrix[np.ix_(row_index, col_index)]
+    z = np.add.reduceat(np.add.reduceat(area, row_starts, axis=0), col_starts, axis=1) / np.outer(row_counts, col_counts)
+    return x, y, np.round(z, 4).astype(np.float32)
+
+
+def dendrogram_layout(tree, orientation, labels):
+    """
+    Axes of a dendrogram figure with the leaf labels on the leaf axis.
+    """
+    label_axis = 'xaxis' if orientation == 'bottom' else 'yaxis'
+    sign = -1 if orientation == 'left' else 1
+    layout = {
+        'xaxis': dict(DENDROGRAM_AXIS),
+        'yaxis': dict(DENDROGRAM_AXIS),
+        'showlegend': False,
+        'autosize': False,
+        'hovermode': 'closest',
+    }
+    layout[label_axis].update(tickvals=[sign * position for position in leaf_positions(len(tree['leaves']))],
+                              ticktext=[labels[i] for i in tree['leaves']], tickmode='array')
+    return layout
+
 def create_main_dashboard(df, signature, title, yaxis_title):
     frequencies = df[signature] * 1
-
-    mutations = ['C>A', 'C>G', 'C>T', 'T>A', 'T>C', 'T>G']
-    bases = ['A', 'C', 'G', 'T']
-    contexts = [f'{x}[{m}]{y}' for m in mutations for x in bases for y in bases]
-
-    colors = {
-        'C>A': 'blue',
-        'C>G': 'black',
-        'C>T': 'red',
-        'T>A': 'gray',
-        'T>C': 'green',
-        'T>G': 'pink'
-    }
+    values = canonical_values(frequencies)
 
     fig = go.Figure()
     
-    for mutation in mutations:
-        mutation_contexts = [c for c in contexts if f'[{mutation}]' in c]
-        mutation_frequencies = [frequencies[mc] if mc in frequencies.index else 0 for mc in mutation_contexts]
-        
+    for mutation in MUTATIONS:
+        block = MUTATION_BLOCKS[mutation]
+
         fig.add_trace(go.Bar(
-            x=mutation_contexts,
-            y=mutation_frequencies,
+            x=[CONTEXTS[i] for i in block],
+            y=values[block],
             name=mutation,
-            marker_color=colors[mutation]
+            marker_color=BAR_COLORS[mutation]
         ))
 
     y_max = frequencies.max()
@@ -59,72 +185,132 @@ def create_main_dashboard(df, signature, title, yaxis_title):
     return fig
 
 
-def create_heatmap_with_custom_sim(df, calc_func=calculate_rmse, colorscale='Blues', hide_heatmap=False, method='complete'):
+@functools.lru_cache(maxsize=None)
+def bar_axes():
+    """
+    What every create_main_dashboard plot shares, as a figure dict: the six traces with their
+    categories and colours but no values, and the layout without title and y range.
+    A page sends it once and draws its profiles client-side from bar_panels values.
+    """
+    fig = go.Figure([go.Bar(x=[CONTEXTS[i] for i in MUTATION_BLOCKS[mutation]], name=mutation,
+                            marker_color=BAR_COLORS[mutation]) for mutation in MUTATIONS])
+    fig.update_layout(
+        title=dict(
+            x=0.5,
+            xanchor='center',
+            font=dict(size=12),
+            y=0.95
+        ),
+        xaxis_title='Mutation Context',
+        xaxis_tickangle=-90,
+        template='plotly_white',
+        barmode='group',
+        legend_title='Mutation Type',
+        margin=dict(l=50, r=50, t=80, b=150),
+        xaxis=dict(tickfont=dict(size=8)),
+        yaxis=dict(tickfont=dict(size=10))
+    )
+    return json.loads(pio.to_json(fig, validate=False))
+
+
+def bar_panels(df, signatures, titles=None, yaxis_title=''):
+    """
+    The values of the create_main_dashboard plots of many signatures for bar_axes, a float32 typed array
+    per mutation class: the columns are laid out in canonical order together and each profile is cut
+    into its mutation class blocks by position.
+    """
+    titles = signatures if titles is None else titles
+    selected = df[signatures]
+    # One contiguous float32 row of 96 values per signature
+    profiles = np.ascontiguousarray(canonical_matrix(selected).T, dtype=np.float32)
+    y_max = selected.max().to_numpy(dtype=np.float64)
+    return [{
+        'title': title,
+        'yaxis_title': yaxis_title,
+        'y_max': float(y_max[i]),
+        'y': [typed_array(profiles[i, MUTATION_BLOCKS[mutation]]) for mutation in MUTATIONS],
+    } for i, title in enumerate(titles)]
+
+
+def bar_figure(panel):
+    """
+    Figure dict of one bar_panels entry on bar_axes, as assets/bar_panels.js draws it in the browser.
+    """
+    axes = bar_axes()
+    layout = copy.deepcopy(axes['layout'])
+    layout['title']['text'] = panel['title']
+    layout['yaxis']['title'] = {'text': panel['yaxis_title']}
+    layout['yaxis']['range'] = [0, panel['y_max']]
+    return {'data': [dict(trace, y=dict(y)) for trace, y in zip(axes['data'], panel['y'])], 'layout': layout}
+
+
+def create_main_dashboards(df, signatures, titles=None, yaxis_title=''):
+    """
+    create_main_dashboard of many signatures as figure dicts, built in one batched pass without plotly validation.
+    """
+    return [bar_figure(panel) for panel in bar_panels(df, signatures, titles, yaxis_title)]
+
+
+def create_heatmap_with_custom_sim(df, calc_func=calculate_rmse, colorscale='Blues', hide_heatmap=False, method='complete', scope=None):
     # Transpose data and get labels
     df = df.T
     labels = df.index.tolist()
 
-    n = df.shape[0]
-    dist_matrix = np.zeros((n, n))
-    for i in range(n):
-        for j in range(i + 1, n):
-            rmse = calc_func(df.iloc[i, :], df.iloc[j, :])
-            dist_matrix[i, j] = rmse
-            dist_matrix[j, i] = rmse
+    # scope: hash of the frame df's columns were selected from, so distances are reused across selections
+    df_hash = content_hash(df)
+    dist_matrix = cached_distance_matrix(df, calc_func, df_hash, scope)
+    Z = cached_linkage(df, calc_func, method, df_hash, scope)
 
-    condensed_rmse = squareform(dist_matrix)
-    Z = linkage(condensed_rmse, method=method)
+    # One dendrogram layout serves both axes: the leaf order labels the top axis, the links are drawn on the side
+    tree = dendrogram(Z, no_plot=True)
+    dendro_leaves = tree['leaves']
+    positions = leaf_positions(len(tree['leaves']))
 
-    # Create bottom dendrogram
-    fig = ff.create_dendrogram(df.values, labels=labels, orientation='bottom', linkagefun=lambda _: Z)
-    fig.for_each_trace(lambda trace: trace.update(visible=False))
+    fig = go.Figure(layout=dendrogram_layout(tree, 'bottom', labels))
+    large = len(labels) > LARGE_HEATMAP
 
-    # Create side dendrogram
-    dendro_side = ff.create_dendrogram(df.values, orientation='right', linkagefun=lambda _: Z)
-    if not hide_heatmap:
-        for i in range(len(dendro_side['data'])):
-            dendro_side['data'][i]['xaxis'] = 'x2'
-    
-    # Add side dendrogram data to the figure
-    for data in dendro_side['data']:
-        fig.add_trace(data)
-    dendro_leaves = dendro_side['layout']['yaxis']['ticktext']
-    dendro_leaves = list(map(int, dendro_leaves))
-    
     if not hide_heatmap:
         # Create heatmap
         heat_data = dist_matrix[dendro_leaves, :]
         heat_data = heat_data[:, dendro_leaves]
 
-        heatmap = [
+        if large:
+            # Block averages as float32 with a short hover; heatmap_zoom patches in the cells of a zoomed area
+            x, y, z = block_heatmap(heat_data, positions)
+            hovertemplate = 'similarity: %{z:.3f}<extra></extra>'
+            # Keeps the user's zoom while the figure is patched
+            fig.update_layout(uirevision=df_hash)
+        else:
+            x, y, z = positions, positions, heat_data
+            hovertemplate = 'x: %{x}<br>y: %{y}<br>similarity: %{z:.3f}<extra></extra>'
+
+        # First trace, where heatmap_zoom's patches expect it
+        fig.add_trace(
             go.Heatmap(
-                x=dendro_leaves,
-                y=dendro_leaves,
-                z=heat_data,
+                x=x,
+                y=y,
+                z=z,
                 reversescale=True,
                 colorscale=colorscale,
                 colorbar=dict(
                     x=1.2,
                     xpad=10
                 ),
-                hovertemplate='x: %{x}<br>y: %{y}<br>similarity: %{z:.3f}<extra></extra>'
+                hovertemplate=hovertemplate
             )
-        ]
-
-        heatmap[0]['x'] = fig['layout']['xaxis']['tickvals']
-        heatmap[0]['y'] = dendro_side['layout']['yaxis']['tickvals']
+        )
 
-        # Add heatmap data to the figure
-        for data in heatmap:
-            fig.add_trace(data)
+    # Side dendrogram, a few merged traces for large sets
+    fig.add_traces(dendrogram_traces(tree, 'right', xaxis='x' if hide_heatmap else 'x2', merge=large))
 
+    if not hide_heatmap:
         fig.update_layout(xaxis={'domain': [.15, 1],
                                 'mirror': False,
                                 'showgrid': False,
                                 'showline': False,
                                 'zeroline': False,
                                 'side': 'top',  # Ustawienie etykiet osi X na górze
-                                'tickvals': fig['layout']['xaxis']['tickvals'],
+                                'tickvals': positions,
                                 'ticktext': [labels[i] for i in dendro_leaves]
                                 })
 
@@ -146,7 +332,7 @@ def create_heatmap_with_custom_sim(df, calc_func=calculate_rmse, colorscale='Blu
                              'showline': False,
                              'zeroline': False,
                              'showticklabels': True,
-                             'tickvals': dendro_side['layout']['yaxis']['tickvals'],
+                             'tickvals': positions,
                              'ticktext': [labels[i] for i in dendro_leaves],
                              'side': 'right',
                              })
@@ -169,13 +355,50 @@ def create_heatmap_with_custom_sim(df, calc_func=calculate_rmse, colorscale='Blu
 
     return fig
 
-def create_vertical_dendrogram_with_query_labels_right(df, calc_func=calculate_rmse, method='complete', text=''):
-    import pandas as pd
-    import plotly.figure_factory as ff
-    import plotly.graph_objects as go
-    from scipy.spatial.distance import pdist
-    from scipy.cluster.hierarchy import linkage
+def _zoomed_leaves(relayout, axis, n_leaves):
+    if f'{axis}.range[0]' in relayout:
+        low, high = sorted((relayout[f'{axis}.range[0]'], relayout[f'{axis}.range[1]']))
+    elif f'{axis}.range' in relayout:
+        low, high = sorted(relayout[f'{axis}.range'])
+    else:
+        return slice(None)
+    # Leaves sit at 5, 15, 25, ...
+    start = min(max(0, int(np.floor((low - 5) / 10))), n_leaves)
+    return slice(start, min(max(start, int(np.ceil((high - 5) / 10)) + 1), n_leaves))
+
+
+def heatmap_zoom(df, relayout, calc_func=calculate_rmse, method='complete', scope=None):
+    """
+    Heatmap of a large create_heatmap_with_custom_sim figure for the area zoomed to in relayout (the graph's
+    relayoutData), as x, y and z typed arrays to patch into its first trace; None when relayout does not
+    move the heatmap axes. A zoom reset brings back the block-averaged overview.
+    """
+    if not relayout or not any(key.startswith(('xaxis.', 'yaxis.')) for key in relayout):
+        return None
+    df = df.T
+    if len(df) <= LARGE_HEATMAP:
+        return None
+
+    df_hash = content_hash(df)
+    leaves = leaves_list(cached_linkage(df, calc_func, method, df_hash, scope))
+    matrix = cached_distance_matrix(df, calc_func, df_hash, scope)[np.ix_(leaves, leaves)]
+    rows = _zoomed_leaves(relayout, 'yaxis', len(leaves))
+    cols = _zoomed_leaves(relayout, 'xaxis', len(leaves))
+    if not range(len(leaves))[rows] or not range(len(leaves))[cols]:
+        return None
+
+    x, y, z = block_heatmap(matrix, leaf_positions(len(leaves)), rows, cols)
+    return {'x': typed_array(x, np.float64), 'y': typed_array(y, np.float64), 'z': typed_array(z)}
+
 
+def precompute_heatmap_linkages(df, calc_func=calculate_rmse, scope=None, methods=linkage_methods):
+    """
+    Computes the other clustering methods of a create_heatmap_with_custom_sim panel (see precompute_linkages).
+    """
+    return precompute_linkages(df.T, calc_func, methods, scope=scope)
+
+
+def create_vertical_dendrogram_with_query_labels_right(df, calc_func=calculate_rmse, method='complete', text='', scope=None):
     df = df.T
     df.index = df.index.astype(str)
     ref_df = df[df.index.str.endswith('_ref')]
@@ -187,27 +410,24 @@ def create_vertical_dendrogram_with_query_labels_right(df, calc_func=calculate_r
     ref_labels = ref_df.index.tolist()
     query_labels = query_df.index.tolist()
 
-    dist_ref = pdist(ref_df.values, metric=lambda u, v: calc_func(pd.Series(u), pd.Series(v)))
-    Z = linkage(dist_ref, method=method)
+    Z = cached_linkage(ref_df, calc_func, method, scope=scope)
+
+    # Best reference for every query: first minimum of its row, None when no score is finite
+    scores = cross_distance_matrix(query_df, ref_df, calc_func)
+    scores = np.where(np.isnan(scores), np.inf, scores)
+    best = scores.argmin(axis=1)
 
     similarity_map = {}
-    for query_name in query_labels:
-        query_vector = query_df.loc[query_name]
-        best_match = None
-        best_score = float('inf')
-        for ref_name in ref_labels:
-            score = calc_func(query_vector, ref_df.loc[ref_name])
-            if score < best_score:
-                best_score = score
-                best_match = ref_name
+    for query_name, row, best_index in zip(query_labels, scores, best):
+        best_match = ref_labels[best_index] if np.isfinite(row[best_index]) else None
         if best_match not in similarity_map:
             similarity_map[best_match] = []
         similarity_map[best_match].append(query_name)
 
-    fig = ff.create_dendrogram(ref_df.values, labels=ref_labels, orientation='left', linkagefun=lambda _: Z)
-    fig.for_each_trace(lambda trace: trace.update(visible=True))
+    tree = dendrogram(Z, no_plot=True)
+    fig = go.Figure(data=dendrogram_traces(tree, 'left'), layout=dendrogram_layout(tree, 'left', ref_labels))
 
-    ordered_refs = fig['layout']['yaxis']['ticktext']
+    ordered_refs = [ref_labels[i] for i in tree['leaves']]
     updated_labels = []
     for ref in ordered_refs:
         if ref in similarity_map:
@@ -255,6 +475,52 @@ def create_vertical_dendrogram_with_query_labels_right(df, calc_func=calculate_r
     return fig
 
 
+def precompute_dendrogram_linkages(df, calc_func=calculate_rmse, scope=None, methods=linkage_methods):
+    """
+    Computes the other clustering methods of the _ref signatures of a
+    create_vertical_dendrogram_with_query_labels_right panel.
+    """
+    df = df.T
+    df.index = df.index.astype(str)
+    return precompute_linkages(df[df.index.str.endswith('_ref')], calc_func, methods, scope=scope)
+
+
+def create_epsilon_sensitivity_plot(df, epsilon, calc_func=calculate_rmse, method='complete', epsilons=EPSILON_SWEEP):
+    sensitivity = epsilon_sensitivity(df, epsilons, epsilon, calc_func, method)
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=sensitivity['epsilon'],
+        y=sensitivity['distance_change'],
+        mode='lines+markers',
+        name='Distance change',
+        hovertemplate='ε = %{x:.1e}<br>Relative change: %{y:.3f}<extra></extra>'
+    ))
+    fig.add_trace(go.Scatter(
+        x=sensitivity['epsilon'],
+        y=sensitivity['cophenetic_correlation'],
+        mode='lines+markers',
+        name='Clustering agreement',
+        yaxis='y2',
+        hovertemplate='ε = %{x:.1e}<br>Cophenetic correlation: %{y:.3f}<extra></extra>'
+    ))
+    if epsilon > 0:
+        fig.add_vline(x=epsilon, line_dash='dash', line_color='gray')
+        # Annotation x on a log axis is given in log10 units
+        fig.add_annotation(x=np.log10(epsilon), y=1, yref='paper', text=f'ε = {epsilon:g}',
+                           showarrow=False, yanchor='bottom')
+
+    fig.update_layout(
+        xaxis=dict(title='Epsilon (pseudo-count)', type='log', exponentformat='power'),
+        yaxis=dict(title='Relative change of RePrint distances', rangemode='tozero'),
+        yaxis2=dict(title='Cophenetic correlation with chosen ε', overlaying='y', side='right', range=[0, 1.05]),
+        legend=dict(orientation='h', x=0.5, xanchor='center', y=-0.25),
+        margin=dict(l=60, r=60, t=40, b=60),
+        height=400
+    )
+    return fig
+
+
 def create_empty_figure_with_text(text):
     fig = go.Figure()
     fig.update_layout(
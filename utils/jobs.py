@@ -0,0 +1,71 @@
+import contextlib
+import functools
+import os
+import tempfile
+import time
+
+import diskcache
+from dash import DiskcacheManager
+
+from utils.paths import private_dir
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows: jobs run without the node-wide limit
+    fcntl = None
+
+# Background callback results (pickled) and job slots shared by every worker process on a node, private to the app's user
+JOB_DIR = os.environ.get('REPRINT_JOB_DIR', os.path.join(tempfile.gettempdir(), 'reprint-jobs'))
+MAX_JOBS = int(os.environ.get('REPRINT_MAX_JOBS', os.cpu_count() or 1))
+
+
+@contextlib.contextmanager
+def job_slot(slot_dir=JOB_DIR, max_jobs=MAX_JOBS, poll=0.05):
+    """
+    Holds one of max_jobs lock files for the duration of a job, waiting until one is free.
+    The lock is released by the kernel when a cancelled job process is killed.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    private_dir(slot_dir)
+    while True:
+        for slot in range(max_jobs):
+            f = open(os.path.join(slot_dir, f'slot-{slot}.lock'), 'w')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                continue
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+                f.close()
+            return
+        time.sleep(poll)
+
+
+def _run_in_slot(slot_dir, max_jobs, job_fn, *args):
+    with job_slot(slot_dir, max_jobs):
+        return job_fn(*args)
+
+
+class BoundedDiskcacheManager(DiskcacheManager):
+    """
+    DiskcacheManager whose job processes queue for one of max_jobs node-wide slots before running,
+    so concurrent analyses cannot start more processes than the machine has cores.
+    """
+
+    def __init__(self, cache, max_jobs=MAX_JOBS, slot_dir=JOB_DIR, **kwargs):
+        super().__init__(cache, **kwargs)
+        self.max_jobs = max_jobs
+        self.slot_dir = slot_dir
+
+    def call_job_fn(self, key, job_fn, args, context):
+        return super().call_job_fn(key, functools.partial(_run_in_slot, self.slot_dir, self.max_jobs, job_fn),
+                                   args, context)
+
+
+background_callback_manager = BoundedDiskcacheManager(diskcache.Cache(os.path.join(private_dir(JOB_DIR), 'results')))
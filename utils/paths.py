@@ -0,0 +1,20 @@
+import os
+import stat
+
+
+def private_dir(path):
+    """
+    Creates a directory only this user can access, or checks an existing one (fixing its mode when it is ours).
+    Cached results and job state there are unpickled, so a directory someone else created is refused.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if not hasattr(os, 'getuid'):  # no owners to check on Windows
+        return path
+
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f'{path} is not a directory owned by this user; '
+                              f'point the REPRINT_*_DIR variable at an app-owned path')
+    if info.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
@@ -0,0 +1,210 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Parsed bundled reference matrices kept per worker process
+MAX_REFERENCES = 32
+
+# Memory-mapped binary copies of the bundled text files; bump the version when the layout changes
+BINARY_VERSION = 1
+BINARY_DIR = f'data/reference_bin/v{BINARY_VERSION}'
+BINARY_SOURCES = ['data/signatures/*', 'data/signatures_organ/*/*.csv', 'data/cosmic_reprints/*.reprint']
+
+# Signature names of every bundled reference, committed so the pages can fill their dropdowns without parsing matrices
+HEADER_INDEX = 'data/signature_headers.json'
+HEADER_SOURCES = ['data/signatures/*', 'data/signatures_organ/latest/*.csv']
+
+_references = OrderedDict()
+_lock = threading.Lock()
+_digests = {}
+_headers = {}
+
+
+def read_reference(source):
+    """
+    Parses a bundled reference file (.csv comma-separated, anything else tab-separated) indexed by Type.
+    """
+    sep = ',' if source.endswith('.csv') else '\t'
+    return pd.read_csv(source, sep=sep, index_col=0)
+
+
+def read_columns(source):
+    """
+    Column names of a bundled reference file, parsed from its header line only.
+    """
+    sep = ',' if source.endswith('.csv') else '\t'
+    return pd.read_csv(source, sep=sep, index_col=0, nrows=0).columns.tolist()
+
+
+def build_header_index(sources=None, path=HEADER_INDEX):
+    """
+    Writes the signature names and size of every bundled reference to the header index.
+    """
+    if sources is None:
+        sources = sorted(source for pattern in HEADER_SOURCES for source in glob.glob(pattern))
+    index = {}
+    for source in sources:
+        try:
+            columns = read_columns(source)
+        except pd.errors.EmptyDataError:
+            continue
+        index[source] = {'size': os.stat(source).st_size, 'columns': columns}
+    # One line per source keeps the committed file diffable
+    lines = [f'{json.dumps(source)}: {json.dumps(entry)}' for source, entry in index.items()]
+    with open(path, 'w') as f:
+        f.write('{\n' + ',\n'.join(lines) + '\n}\n')
+    return index
+
+
+def signature_names(source):
+    """
+    Signature names of a bundled reference from the header index; the file's own header is read
+    when the index has no entry for it or the file has changed size since the index was built.
+    """
+    if not _headers:
+        try:
+            with open(HEADER_INDEX) as f:
+                _headers.update(json.load(f))
+        except FileNotFoundError:
+            pass
+    entry = _headers.get(source)
+    if entry is not None and entry['size'] == os.stat(source).st_size:
+        return list(entry['columns'])
+    return read_columns(source)
+
+
+def source_digest(source):
+    """
+    Content hash of a source file, recomputed only when its mtime or size changes
+    (mtimes alone do not survive a git checkout).
+    """
+    stat = os.stat(source)
+    key = (source, stat.st_mtime_ns, stat.st_size)
+    if key not in _digests:
+        with open(source, 'rb') as f:
+            _digests[key] = hashlib.sha1(f.read()).hexdigest()
+    return _digests[key]
+
+
+def atomic_write(path, write):
+    """
+    Writes a file through write(f) on a temporary file that replaces path only once complete.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _binary_paths(source, binary_dir):
+    name = os.path.join(binary_dir, source.replace('/', '__'))
+    return name + '.npy', name + '.json'
+
+
+def write_binary(source, df, binary_dir=BINARY_DIR):
+    """
+    Stores a parsed reference as a column-major float64 .npy array plus a JSON file with its labels
+    and the digest of the text it was converted from.
+    """
+    values_path, meta_path = _binary_paths(source, binary_dir)
+    os.makedirs(binary_dir, exist_ok=True)
+    values = np.asfortranarray(df.to_numpy(dtype=np.float64))
+    meta = {
+        'version': BINARY_VERSION,
+        'digest': source_digest(source),
+        'index': list(map(str, df.index)),
+        'index_name': df.index.name,
+        'columns': list(map(str, df.columns)),
+    }
+    # Values first: the metadata marks the pair as up to date
+    atomic_write(values_path, lambda f: np.save(f, values))
+    atomic_write(meta_path, lambda f: f.write(json.dumps(meta).encode('utf-8')))
+    return meta
+
+
+def read_binary(source, binary_dir=BINARY_DIR):
+    """
+    Reference matrix memory-mapped from its binary copy, converted again from the text file when that
+    changed. Files that cannot be converted (non-numeric values, read-only data directory) are parsed as text.
+    """
+    values_path, meta_path = _binary_paths(source, binary_dir)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        meta = None
+
+    if meta is None or meta.get('version') != BINARY_VERSION or meta['digest'] != source_digest(source):
+        df = read_reference(source)
+        try:
+            meta = write_binary(source, df, binary_dir)
+        except (ValueError, TypeError, OSError):
+            return _read_only(df)
+
+    values = np.load(values_path, mmap_mode='r')
+    index = pd.Index(meta['index'], name=meta['index_name'])
+    return pd.DataFrame(values, index=index, columns=meta['columns'], copy=False)
+
+
+def convert_references(sources=None, binary_dir=BINARY_DIR, verbose=False):
+    """
+    Writes binary copies of every bundled reference (signatures, organ signatures, cosmic_reprints)
+    that is missing or out of date. Files pandas cannot read as a numeric matrix are skipped.
+    """
+    if sources is None:
+        sources = sorted(path for pattern in BINARY_SOURCES for path in glob.glob(pattern))
+    for source in sources:
+        try:
+            df = read_binary(source, binary_dir)
+        except (ValueError, pd.errors.EmptyDataError) as e:
+            if verbose:
+                print(f'{source}: skipped ({e})')
+            continue
+        if verbose:
+            print(f'{source}: {df.shape[0]} types x {df.shape[1]} columns')
+
+
+def _read_only(df):
+    values = df.to_numpy()
+    values.flags.writeable = False
+    return pd.DataFrame(values, index=df.index, columns=df.columns, copy=False)
+
+
+def load_reference(source):
+    """
+    Parsed reference matrix from the per-process LRU registry, re-read when the file's mtime or size changes.
+    The returned frame is a shallow copy over read-only values: relabelling it is fine, writing to it raises.
+    """
+    stat = os.stat(source)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+
+    with _lock:
+        entry = _references.get(source)
+        if entry is not None and entry[0] == stamp:
+            _references.move_to_end(source)
+            return entry[1].copy(deep=False)
+
+    df = read_binary(source)
+
+    with _lock:
+        _references[source] = (stamp, df)
+        _references.move_to_end(source)
+        while len(_references) > MAX_REFERENCES:
+            _references.popitem(last=False)
+    return df.copy(deep=False)
+
+
+def clear_references():
+    with _lock:
+        _references.clear()
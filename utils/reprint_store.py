@@ -0,0 +1,129 @@
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.utils import FILES, reprint_sweep
+from utils.analysis import cached_reprint
+from utils.references import read_reference, load_reference, source_digest, atomic_write
+
+# Bump when the on-disk layout changes; older stores are then ignored
+STORE_VERSION = 1
+STORE_DIR = f'data/reprint_store/v{STORE_VERSION}'
+MANIFEST = 'manifest.json'
+
+# 0 is used by the bundled .reprint files, 1e-4 is the UI default, 10e-4 the reprint() default
+EPSILONS = [0.0, 1e-6, 1e-5, 1e-4, 1e-3, 1e-2]
+
+_manifest = {'mtime': None, 'entries': {}}
+
+
+def reference_sources():
+    """
+    Every bundled reference matrix: the COSMIC FILES, the other data/signatures files and the organ signatures.
+    """
+    sources = [f'data/signatures/{file}' for file in FILES]
+    sources += [path for path in sorted(glob.glob('data/signatures/*')) if path not in sources]
+    sources += sorted(glob.glob('data/signatures_organ/latest/*.csv'))
+    return sources
+
+
+def _entry_name(source):
+    return source.replace('/', '__') + '.npy'
+
+
+def _up_to_date(entry, source, epsilons, store_dir):
+    """
+    True when a manifest entry was built from the current source at these epsilons and its array is on disk.
+    """
+    if entry is None or entry['epsilons'] != list(epsilons) \
+            or not os.path.exists(os.path.join(store_dir, entry['file'])):
+        return False
+    stat = os.stat(source)
+    # An unchanged mtime and size skip hashing; a checkout that only touched the file still matches its digest
+    if entry.get('mtime') == stat.st_mtime_ns and entry.get('size') == stat.st_size:
+        return True
+    return entry['digest'] == source_digest(source)
+
+
+def build_store(sources=None, epsilons=EPSILONS, store_dir=STORE_DIR, force=False, verbose=False):
+    """
+    Computes RePrint matrices of every source at every epsilon and writes them as
+    one (n_epsilons, n_types, n_signatures) .npy array per source plus a JSON manifest.
+    Sources whose manifest entry is up to date are kept as they are unless force is set.
+    """
+    sources = reference_sources() if sources is None else sources
+    os.makedirs(store_dir, exist_ok=True)
+
+    previous = {} if force else _entries(store_dir)
+    entries = {}
+    for source in sources:
+        stat = os.stat(source)
+        if _up_to_date(previous.get(source), source, epsilons, store_dir):
+            entries[source] = dict(previous[source], mtime=stat.st_mtime_ns, size=stat.st_size)
+            if verbose:
+                print(f'{source}: up to date')
+            continue
+        data = read_reference(source)
+        stack = reprint_sweep(data, epsilons)
+        atomic_write(os.path.join(store_dir, _entry_name(source)), lambda f: np.save(f, stack))
+        entries[source] = {
+            'file': _entry_name(source),
+            'digest': source_digest(source),
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'epsilons': list(epsilons),
+            'types': data.index.tolist(),
+            'columns': data.columns.tolist(),
+        }
+        if verbose:
+            print(f'{source}: {stack.shape[2]} signatures x {len(epsilons)} epsilons')
+
+    manifest = {'version': STORE_VERSION, 'entries': entries}
+    atomic_write(os.path.join(store_dir, MANIFEST), lambda f: f.write(json.dumps(manifest).encode('utf-8')))
+    return manifest
+
+
+def _entries(store_dir=STORE_DIR):
+    path = os.path.join(store_dir, MANIFEST)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+
+    if _manifest['mtime'] != mtime:
+        with open(path) as f:
+            manifest = json.load(f)
+        _manifest['entries'] = manifest['entries'] if manifest.get('version') == STORE_VERSION else {}
+        _manifest['mtime'] = mtime
+    return _manifest['entries']
+
+
+def load_reprint(source, epsilon, store_dir=STORE_DIR):
+    """
+    Precomputed RePrint matrix of a bundled reference, or None when the store has no
+    up-to-date entry for this source and epsilon.
+    """
+    entry = _entries(store_dir).get(source)
+    if entry is None or epsilon is None or not os.path.exists(source) or entry['digest'] != source_digest(source):
+        return None
+
+    matches = np.flatnonzero(np.isclose(entry['epsilons'], float(epsilon), rtol=1e-9, atol=0))
+    if len(matches) == 0:
+        return None
+
+    stack = np.load(os.path.join(store_dir, entry['file']), mmap_mode='r')
+    return pd.DataFrame(np.array(stack[matches[0]]), index=entry['types'], columns=entry['columns'])
+
+
+def reference_reprint(source, epsilon, data=None):
+    """
+    RePrint of a bundled reference served from the store, computed from data (or the source file) otherwise.
+    """
+    df_reprint = load_reprint(source, epsilon)
+    if df_reprint is not None:
+        return df_reprint
+    data = load_reference(source) if data is None else data
+    return cached_reprint(data, epsilon)
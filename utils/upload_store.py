@@ -0,0 +1,97 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.paths import private_dir
+
+# Uploaded matrices live on the server; the browser session only keeps their handle
+UPLOAD_DIR = os.environ.get('REPRINT_UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'reprint-uploads'))
+UPLOAD_TTL = int(os.environ.get('REPRINT_UPLOAD_TTL', 24 * 3600))
+
+UPLOAD_EXPIRED_MESSAGE = 'Uploaded signatures have expired, please upload the file again.'
+
+
+def _path(handle):
+    return os.path.join(UPLOAD_DIR, f'{handle}.npz')
+
+
+def purge_expired(now=None):
+    """
+    Deletes uploads not used for UPLOAD_TTL seconds.
+    """
+    now = time.time() if now is None else now
+    private_dir(UPLOAD_DIR)
+    for name in os.listdir(UPLOAD_DIR):
+        path = os.path.join(UPLOAD_DIR, name)
+        try:
+            if now - os.stat(path).st_mtime > UPLOAD_TTL:
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def save_upload(df):
+    """
+    Stores a Type-indexed signature matrix as float64 values plus its labels and returns its content-hash handle.
+    """
+    values = np.ascontiguousarray(df.to_numpy(dtype=np.float64))
+    # Fixed-width unicode labels so the archive loads without pickle
+    index = np.array(list(map(str, df.index)), dtype=str)
+    columns = np.array(list(map(str, df.columns)), dtype=str)
+
+    h = hashlib.sha1()
+    for part in (values, index, columns):
+        h.update(part.tobytes())
+    handle = h.hexdigest()
+
+    private_dir(UPLOAD_DIR)
+    purge_expired()
+    path = _path(handle)
+    if os.path.exists(path):
+        os.utime(path)
+        return handle
+
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, values=values, index=index, columns=columns)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return handle
+
+
+def load_upload(handle):
+    """
+    Uploaded matrix for a handle (index named Type), or None when it is unknown or expired.
+    Every access extends its lifetime by UPLOAD_TTL.
+    """
+    # Handles come back from the browser; only accept our own content hashes
+    if not isinstance(handle, str) or not re.fullmatch(r'[0-9a-f]{40}', handle):
+        return None
+    private_dir(UPLOAD_DIR)
+    path = _path(handle)
+    try:
+        with np.load(path, allow_pickle=False) as stored:
+            values, index, columns = stored['values'], stored['index'], stored['columns']
+        os.utime(path)
+    except (FileNotFoundError, ValueError, OSError):
+        return None
+    return pd.DataFrame(values, index=pd.Index(index.tolist(), name='Type'), columns=columns.tolist())
+
+
+def session_upload(session):
+    """
+    Uploaded matrix referenced by a dcc.Store session entry, or None when there is none or it has expired.
+    """
+    if isinstance(session, list):
+        session = session[0] if session else None
+    if not session or not session.get('handle'):
+        return None
+    return load_upload(session['handle'])
@@ -1,51 +1,93 @@
 import base64
+import binascii
+import csv
 import numpy as np
 import io
 import re
 import pandas as pd
+from utils.references import load_reference
+
+# Base64 characters decoded per step; a multiple of 4 so every chunk decodes on its own
+DECODE_CHUNK = 4 * 2 ** 20
+
+
+def decode_upload(contents, chunk_size=DECODE_CHUNK):
+    """
+    Decodes a dcc.Upload data URL chunk by chunk into a binary buffer, without building
+    the whole decoded payload as bytes and again as str.
+    """
+    header, _, content_string = contents.partition(',')
+    if not header.endswith(';base64'):
+        raise ValueError('Upload contents must be a base64 data URL')
+
+    buffer = io.BytesIO()
+    try:
+        for start in range(0, len(content_string), chunk_size):
+            buffer.write(base64.b64decode(content_string[start:start + chunk_size], validate=True))
+    except binascii.Error as e:
+        raise ValueError(f'Upload is not valid base64: {e}')
+    buffer.seek(0)
+    return buffer
+
+
+def read_header(buffer, sep):
+    """
+    Column names from the first line of a decoded upload; the buffer is rewound afterwards.
+    """
+    line = buffer.readline().decode('utf-8-sig')
+    buffer.seek(0)
+    return next(csv.reader([line.rstrip('\r\n')], delimiter=sep), [])
+
+
+def read_table(buffer, sep, labels=None, index_columns=0):
+    """
+    Parses a decoded upload whose label columns (by default the first index_columns) are text and
+    every other column is numeric. Numeric columns are parsed straight into float64, so a bad value
+    stops the parse instead of turning the column into Python objects.
+    """
+    header = read_header(buffer, sep)
+    labels = header[:index_columns] if labels is None else labels
+    for label in labels:
+        if label not in header:
+            raise ValueError(f"Uploaded file must include a '{label}' column.")
+    if len(header) <= len(labels):
+        raise ValueError('Uploaded file has no data columns')
+
+    dtype = {column: str if column in labels else np.float64 for column in header}
+    try:
+        return pd.read_csv(buffer, sep=sep, dtype=dtype, encoding='utf-8-sig',
+                           index_col=list(range(index_columns)) if index_columns else None)
+    except ValueError as e:
+        raise ValueError(f'Uploaded file must contain only numeric values besides its labels: {e}')
 
-def parse_contents(contents, filename):
-    content_type, content_string = contents.split(',')
-    decoded = base64.b64decode(content_string)
-
-    file_content = decoded.decode('utf-8')
 
-    if format == 'TSV Format' or format == 'Mutated CSV Format' or format == 'Mutated TSV Format':
-        return pd.read_csv(io.StringIO(decoded.decode('utf-8')), index_col=0, sep=sep)
-    if format == 'CSV Format':
-        return pd.read_csv(io.StringIO(decoded.decode('utf-8')), index_col=[0, 1], sep=sep)
+def parse_contents(contents, filename):
+    buffer = decode_upload(contents)
 
     if 'csv' in filename:
-        return pd.read_csv(io.StringIO(decoded.decode('utf-8')), index_col=[0, 1], sep=',')
+        return read_table(buffer, sep=',', index_columns=2)
     elif 'txt' in filename:
-        return pd.read_csv(io.StringIO(decoded.decode('utf-8')), index_col=0, sep='\t')
+        return read_table(buffer, sep='\t', index_columns=1)
     elif 'xls' in filename:
-        return pd.read_excel(io.BytesIO(decoded))
+        return pd.read_excel(buffer)
 
-    if format == 'Unknown Format':
-        raise ValueError('Unknown Format')
+    raise ValueError('Unknown Format')
 
 def parse_signatures(contents, filename):
-    content_type, content_string = contents.split(',')
-
-    decoded = base64.b64decode(content_string)
+    buffer = decode_upload(contents)
     if 'txt' in filename:
-        return pd.read_csv(io.StringIO(decoded.decode('utf-8')), index_col=0, sep='\t')
+        return read_table(buffer, sep='\t', index_columns=1)
     if 'csv' in filename:
-        return pd.read_csv(io.StringIO(decoded.decode('utf-8')), index_col=[0, 1], sep=',')
+        return read_table(buffer, sep=',', index_columns=2)
 
 
 def load_signatures(filename, organ=False):
     if organ:
         file_path = f'data/signatures_organ/latest/{filename}'
-        delimiter = ','
     else:
-        delimiter = '\t' if '.txt' in filename else ','
         file_path = f'data/signatures/{filename}'
 
-    df = pd.read_csv(file_path, delimiter=delimiter, header=0)
-    if 'Type' in df.columns[0] or 'Unnamed: 0' in df.columns[0]:
-        df = df.drop(df.columns[0], axis=1)
+    df = load_reference(file_path)
 
     names_signatures = df.columns.tolist()
 
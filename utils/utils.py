@@ -1,5 +1,8 @@
+import warnings
+
 import numpy as np
 import pandas as pd
+from utils.contexts import GROUP_CODES, N_GROUPS, context_positions, is_known
 
 FILES = [
     'COSMIC_v3.4_SBS_GRCh38.txt',
@@ -86,63 +89,188 @@ def js_divergence(p, q):
     return 0.5 * kl_divergence(p, m) + 0.5 * kl_divergence(q, m)
 
 
+# Batched kernels: distances between every row of a and every row of b (of a when b is None).
+# They follow the pairwise definitions above and are computed in row blocks to bound memory.
+_BLOCK_ELEMENTS = 2 ** 22
+
+
+def _rows(a, b):
+    a = np.asarray(a, dtype=np.float64)
+    b = a if b is None else np.asarray(b, dtype=np.float64)
+    return a, b
+
+
+def _row_blocks(a, b):
+    step = max(1, _BLOCK_ELEMENTS // max(1, b.shape[0] * b.shape[1]))
+    for start in range(0, a.shape[0], step):
+        yield slice(start, start + step)
+
+
+def rmse_matrix(a, b=None):
+    a, b = _rows(a, b)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a_min, a_max = np.nanmin(a, axis=1, keepdims=True), np.nanmax(a, axis=1, keepdims=True)
+        b_min, b_max = np.nanmin(b, axis=1, keepdims=True), np.nanmax(b, axis=1, keepdims=True)
+        a_normalized = (a - a_min) / (a_max - a_min)
+        b_normalized = (b - b_min) / (b_max - b_min)
+
+    has_nan = np.isnan(a_normalized).any() or np.isnan(b_normalized).any()
+    out = np.empty((a.shape[0], b.shape[0]))
+    for block in _row_blocks(a, b):
+        squared = (a_normalized[block, None, :] - b_normalized[None, :, :]) ** 2
+        if has_nan:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                out[block] = np.nanmean(squared, axis=2)
+        else:
+            out[block] = squared.mean(axis=2)
+    return np.sqrt(out)
+
+
+def cosine_matrix(a, b=None):
+    a, b = _rows(a, b)
+    a_norm = np.sqrt(np.einsum('ij,ij->i', a, a))
+    b_norm = np.sqrt(np.einsum('ij,ij->i', b, b))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 1 - (a @ b.T) / (a_norm[:, None] * b_norm[None, :])
+
+
+def _probabilities(a):
+    # np.sum on a pandas row skips NaN, hence nansum
+    totals = np.nansum(a, axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(totals > 0, a / totals, a)
+
+
+def js_divergence_matrix(a, b=None):
+    a, b = _rows(a, b)
+    eps = 1e-12
+    p, q = _probabilities(a), _probabilities(b)
+    p_clipped, q_clipped = np.clip(p, eps, 1), np.clip(q, eps, 1)
+
+    out = np.empty((a.shape[0], b.shape[0]))
+    for block in _row_blocks(a, b):
+        m = np.clip(0.5 * (p[block, None, :] + q[None, :, :]), eps, 1)
+        kl_p = np.sum(p_clipped[block, None, :] * np.log(p_clipped[block, None, :] / m), axis=2)
+        kl_q = np.sum(q_clipped[None, :, :] * np.log(q_clipped[None, :, :] / m), axis=2)
+        out[block] = 0.5 * kl_p + 0.5 * kl_q
+    return out
+
+
+DISTANCE_MATRICES = {
+    calculate_rmse: rmse_matrix,
+    calculate_cosine: cosine_matrix,
+    calculate_js_divergence: js_divergence_matrix,
+}
+
+
+def distance_matrix(df, calc_func=calculate_rmse):
+    """
+    Symmetric distance matrix between the rows of df with a zero diagonal, as expected by squareform.
+    Known metrics use their batched kernel; any other calc_func is applied pair by pair.
+    """
+    n = df.shape[0]
+    kernel = DISTANCE_MATRICES.get(calc_func)
+    if kernel is None:
+        dist_matrix = np.zeros((n, n))
+        for i in range(n):
+            for j in range(i + 1, n):
+                dist_matrix[i, j] = calc_func(df.iloc[i, :], df.iloc[j, :])
+    else:
+        dist_matrix = np.triu(kernel(df.to_numpy(dtype=np.float64)), k=1)
+    return dist_matrix + dist_matrix.T
+
+
+def cross_distance_matrix(df_a, df_b, calc_func=calculate_rmse):
+    """
+    Distances between every row of df_a (rows of the result) and every row of df_b (columns).
+    """
+    kernel = DISTANCE_MATRICES.get(calc_func)
+    if kernel is not None:
+        return kernel(df_a.to_numpy(dtype=np.float64), df_b.to_numpy(dtype=np.float64))
+    return np.array([[calc_func(df_a.iloc[i, :], df_b.iloc[j, :]) for j in range(df_b.shape[0])]
+                     for i in range(df_a.shape[0])]).reshape(df_a.shape[0], df_b.shape[0])
+
+
+def _reprint_groups(mutation_types):
+    """
+    Groups the NL[X>Y]NR mutation types by their (NL, X, NR) denominator set.
+    Returns a group code per type and a mask of the types that enter the denominator (Y != X).
+    """
+    positions = context_positions(mutation_types)
+    if is_known(positions):
+        return GROUP_CODES[positions], np.ones(len(positions), dtype=bool), N_GROUPS
+
+    keys = [(mutation[0], mutation[2], mutation[6]) for mutation in mutation_types]
+    group_ids = {}
+    codes = np.array([group_ids.setdefault(key, len(group_ids)) for key in keys], dtype=np.intp)
+    in_denominator = np.array([mutation[4] != mutation[2] for mutation in mutation_types], dtype=bool)
+    return codes, in_denominator, len(group_ids)
+
+
 def reprint(data, epsilon=10e-4):
-    # Extracting mutation categories and their probabilities
+    """
+    Computes RePrint probabilities for every signature (column) of data at once.
+    Each mutation NL[X>Y]NR is divided by the sum over its NL[X>Z]NR group (Z != X),
+    after adding epsilon; a zero denominator yields 0.
+    """
     mutation_types = data.index
-    signatures = data.columns
+    codes, in_denominator, n_groups = _reprint_groups(mutation_types)
 
-    # Initialize a dictionary to store the RePrint probabilities for each signature
-    reprint_probabilities = {signature: {} for signature in signatures}
+    signature_probs = data.to_numpy(dtype=np.float64) + epsilon
 
-    # Iterate over each signature
-    for signature in signatures:
-        # Extract the probabilities for the current signature
-        signature_probs = data[signature].values + epsilon
+    denominators = np.zeros((n_groups, signature_probs.shape[1]))
+    np.add.at(denominators, codes[in_denominator], signature_probs[in_denominator])
+    denominators = denominators[codes]
 
-        # Iterate over each mutation type
-        for idx, mutation in enumerate(mutation_types):
-            # Split the mutation type to extract NL, X, Y, NR
-            NL = mutation[0]
-            NR = mutation[6]
-            X, Y = mutation[2], mutation[4]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reprint_probs = np.where(denominators != 0, signature_probs / denominators, 0.0)
 
-            # Compute the denominator: sum of probabilities for Z != X
-            denominator = np.sum([signature_probs[j] for j in range(len(mutation_types))
-                                  if mutation_types[j].startswith(f"{NL}[{X}>") and mutation_types[j].endswith(f"]{NR}")
-                                  and mutation_types[j][4] != X])
+    return pd.DataFrame(reprint_probs, index=mutation_types.rename(None), columns=data.columns)
 
-            # Compute the RePrint probability for the current mutation
-            reprint_prob = signature_probs[idx] / denominator if denominator != 0 else 0
 
-            # Store the RePrint probability
-            reprint_probabilities[signature][mutation] = reprint_prob
+def reprint_terms(data):
+    """
+    Epsilon-independent parts of RePrint: the probabilities p, the sum S of p over every type's
+    denominator group and the size k of that group, so that RePrint = (p + eps) / (S + k * eps).
+    """
+    codes, in_denominator, n_groups = _reprint_groups(data.index)
+    signature_probs = data.to_numpy(dtype=np.float64)
 
-    # Convert the reprint_probabilities dictionary to a DataFrame for better readability
-    reprint_df = pd.DataFrame(reprint_probabilities)
-    return reprint_df
+    group_sums = np.zeros((n_groups, signature_probs.shape[1]))
+    np.add.at(group_sums, codes[in_denominator], signature_probs[in_denominator])
+    group_sizes = np.bincount(codes[in_denominator], minlength=n_groups).astype(np.float64)
+    return signature_probs, group_sums[codes], group_sizes[codes]
 
-import base64
-import io
-def parse_signatures(contents, filename):
-    content_type, content_string = contents.split(',')
 
+def reprint_sweep(data, epsilons, terms=None):
+    """
+    RePrint of data at every epsilon with one broadcast, as an (n_epsilons, n_types, n_signatures) array.
+    terms are the reprint_terms of data, when already computed.
+    """
+    signature_probs, group_sums, group_sizes = reprint_terms(data) if terms is None else terms
+    epsilons = np.asarray(epsilons, dtype=np.float64)[:, None, None]
+
+    numerators = signature_probs + epsilons
+    denominators = group_sums + group_sizes[:, None] * epsilons
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominators != 0, numerators / denominators, 0.0)
+
+from utils.uploader import decode_upload, read_table
+
+
+def parse_signatures(contents, filename):
     try:
-        decoded = base64.b64decode(content_string)
-        decoded_str = decoded.decode('utf-8')
-        buffer = io.StringIO(decoded_str)
+        buffer = decode_upload(contents)
 
         # Wybór parsera na podstawie rozszerzenia
         if filename.endswith('.txt') or filename.endswith('.tsv'):
-            df = pd.read_csv(buffer, sep='\t')
+            df = read_table(buffer, sep='\t', labels=['Type'])
         elif filename.endswith('.csv'):
-            df = pd.read_csv(buffer, sep=',', index_col=None)
+            df = read_table(buffer, sep=',', labels=['Type'])
         else:
             raise ValueError(f"Unsupported file format for file: {filename}")
 
-        # Sprawdzenie wymaganych kolumn
-        if 'Type' not in df.columns:
-            raise ValueError("Uploaded file must include a 'Type' column.")
-
         # Dodatkowe sprawdzenie danych
         print(f"Parsed file: {filename}")
         print(f"Columns: {df.columns.tolist()}")